@@ -0,0 +1,323 @@
+import random
+import time
+from algorithms import get_grid, get_distance_table, UNREACHABLE
+from pellet_index import get_pellet_index
+
+SEARCH_TIME_MS = 5.0
+MAX_DEPTH = 16
+# Chỉ ghost trong bán kính này (theo mê cung) được đưa vào cây tìm kiếm
+GHOST_RADIUS = 8
+MAX_TABLE_ENTRIES = 200000
+
+DEATH = -100000
+WIN = 100000
+PELLET_REWARD = 10
+POWER_REWARD = 50
+GHOST_REWARD = 200
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def food_distances(graph, map_data):
+    # BFS đa nguồn từ mọi pellet / power pellet còn lại
+    return food_distances_from(
+        graph,
+        [
+            cid
+            for cid, (x, y) in enumerate(graph.cells)
+            if map_data[y][x] in ".o"
+        ],
+    )
+
+
+def food_distances_from(graph, sources):
+    food = [UNREACHABLE] * graph.size
+    frontier = list(sources)
+    for cid in frontier:
+        food[cid] = 0
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for cell in frontier:
+            for nb in graph.neighbors[cell]:
+                if food[nb] == UNREACHABLE:
+                    food[nb] = depth
+                    next_frontier.append(nb)
+        frontier = next_frontier
+    return food
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class AlphaBetaPlanner:
+    # Alpha-beta trên trạng thái thu gọn (ô Pacman, ô + trạng thái hoảng sợ
+    # của các ghost gần, tập pellet đã ăn trong cây). Pacman là MAX, mỗi
+    # ghost là một tầng MIN; ghost chậm bằng nửa Pacman nên cứ hai lượt
+    # Pacman thì ghost đi một lượt. Bảng chuyển vị băm Zobrist, sắp thứ tự
+    # nước đi theo khoảng tới pellet, đào sâu dần tới khi hết thời gian
+    def __init__(self, time_ms=SEARCH_TIME_MS, max_depth=MAX_DEPTH):
+        self.time_ms = time_ms
+        self.max_depth = max_depth
+        self.graph = None
+        self.table = {}
+        self.food_key = None
+        self.depth_reached = 0
+        self.nodes = 0
+        self.tt_hits = 0
+
+    def _prepare(self, graph, ghost_count):
+        if graph is not self.graph:
+            self.graph = graph
+            rng = random.Random(graph.size)
+            self.z_pacman = [rng.getrandbits(64) for _ in range(graph.size)]
+            self.z_eaten = [rng.getrandbits(64) for _ in range(graph.size)]
+            self.z_turn = rng.getrandbits(64)
+            self.z_ghost = []
+            self.z_fright = []
+            self.rng = rng
+            self.food_key = None
+        while len(self.z_ghost) < ghost_count:
+            self.z_ghost.append(
+                [self.rng.getrandbits(64) for _ in range(graph.size)]
+            )
+            self.z_fright.append(self.rng.getrandbits(64))
+
+    def _food_distances(self, map_data, remaining):
+        # Chỉ tính lại khi có pellet bị ăn
+        key = (id(map_data), remaining)
+        if key != self.food_key:
+            self.food_key = key
+            self.food = food_distances(self.graph, map_data)
+        return self.food
+
+    def _distance(self, a, b):
+        if self.dist is not None:
+            return self.dist[a * self.graph.size + b]
+        xs, ys = self.graph.xs, self.graph.ys
+        return abs(xs[a] - xs[b]) + abs(ys[a] - ys[b])
+
+    def _tick(self):
+        self.nodes += 1
+        if self.nodes & 127 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+    def direction(self, map_data, start, ghosts):
+        # ghosts: danh sách ((x, y), đang hoảng sợ) của các ghost còn sống
+        graph = get_grid(map_data)
+        start_id = graph.cell_id(start)
+        if start_id < 0 or not graph.neighbors[start_id]:
+            return None
+        self._prepare(graph, len(ghosts))
+        table = get_distance_table(map_data)
+        self.dist = table.dist if table else None
+        self.map_data = map_data
+        self.remaining = get_pellet_index(map_data).remaining()
+
+        self.pac = start_id
+        self.ghost_cells, self.fright = [], []
+        for pos, frightened in ghosts:
+            cid = graph.cell_id(pos)
+            if cid >= 0 and self._distance(start_id, cid) <= GHOST_RADIUS:
+                self.ghost_cells.append(cid)
+                self.fright.append(frightened)
+        self.food = self._food_distances(map_data, self.remaining)
+        self.eaten = set()
+        self.hash = self.z_pacman[start_id]
+        for i, cid in enumerate(self.ghost_cells):
+            self.hash ^= self.z_ghost[i][cid]
+            if self.fright[i]:
+                self.hash ^= self.z_fright[i]
+        self.ghost_turn = True
+        # Giá trị trong bảng tính theo pellet hiện có nên chỉ dùng trong một
+        # lần quyết định
+        self.table.clear()
+
+        self.nodes = 0
+        self.tt_hits = 0
+        self.depth_reached = 0
+        self.deadline = time.perf_counter() + self.time_ms / 1000
+        best_move = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                value, move = self._pacman(depth, DEATH - 1, WIN + 1, True)
+            except SearchTimeout:
+                break
+            best_move, self.depth_reached = move, depth
+            if abs(value) >= WIN // 2:
+                break
+        if best_move is None:
+            return None
+        return (
+            graph.xs[best_move] - graph.xs[start_id],
+            graph.ys[best_move] - graph.ys[start_id],
+        )
+
+    def _move_pacman(self, cell):
+        # Trả về (phần thưởng, thông tin hoàn tác); phần thưởng DEATH nếu
+        # đụng ghost không hoảng sợ
+        undo = (self.pac, self.hash, list(self.fright), list(self.ghost_cells))
+        self.hash ^= self.z_pacman[self.pac] ^ self.z_pacman[cell]
+        self.pac = cell
+        reward = 0
+        if cell not in self.eaten:
+            tile = self.map_data[self.graph.ys[cell]][self.graph.xs[cell]]
+            if tile == "." or tile == "o":
+                self.eaten.add(cell)
+                self.hash ^= self.z_eaten[cell]
+                reward = PELLET_REWARD
+                if tile == "o":
+                    reward = POWER_REWARD
+                    for i, frightened in enumerate(self.fright):
+                        if not frightened and self.ghost_cells[i] >= 0:
+                            self.fright[i] = True
+                            self.hash ^= self.z_fright[i]
+        collision = self._collide(cell)
+        if collision == DEATH:
+            return DEATH, undo
+        return reward + collision, undo
+
+    def _collide(self, cell):
+        reward = 0
+        for i, ghost in enumerate(self.ghost_cells):
+            if ghost == cell:
+                if not self.fright[i]:
+                    return DEATH
+                # Ăn ghost hoảng sợ: ghost rời khỏi cây tìm kiếm
+                self.ghost_cells[i] = -1
+                self.hash ^= self.z_ghost[i][cell] ^ self.z_fright[i]
+                reward += GHOST_REWARD
+        return reward
+
+    def _undo(self, undo, ate):
+        self.pac, self.hash, self.fright, self.ghost_cells = undo
+        if ate is not None:
+            self.eaten.discard(ate)
+
+    def _evaluate(self):
+        pac = self.pac
+        food = self.food[pac]
+        value = -food if food != UNREACHABLE else 0
+        for i, cell in enumerate(self.ghost_cells):
+            if cell < 0:
+                continue
+            d = self._distance(pac, cell)
+            if self.fright[i]:
+                value += max(0, GHOST_RADIUS - d) * 5
+            else:
+                value -= max(0, 6 - d) * 20
+        return value
+
+    def _pacman(self, depth, alpha, beta, root=False):
+        self._tick()
+        if depth == 0:
+            return self._evaluate()
+        key = self.hash
+        entry = self.table.get(key)
+        tt_move = -1
+        if entry is not None:
+            e_depth, e_value, e_flag, tt_move = entry
+            if (
+                not root
+                and e_depth >= depth
+                and (
+                    e_flag == EXACT
+                    or (e_flag == LOWER and e_value >= beta)
+                    or (e_flag == UPPER and e_value <= alpha)
+                )
+            ):
+                self.tt_hits += 1
+                return e_value
+
+        food = self.food
+        moves = sorted(
+            self.graph.neighbors[self.pac],
+            key=lambda v: (v != tt_move, food[v]),
+        )
+        alpha0 = alpha
+        best, best_move = DEATH - 1, moves[0]
+        for cell in moves:
+            new_pellet = cell not in self.eaten
+            reward, undo = self._move_pacman(cell)
+            ate = cell if new_pellet and cell in self.eaten else None
+            if reward == DEATH:
+                value = DEATH
+            elif len(self.eaten) >= self.remaining:
+                value = reward + WIN
+            else:
+                value = reward + self._ghosts(
+                    0, depth, alpha - reward, beta - reward
+                )
+            self._undo(undo, ate)
+            if value > best:
+                best, best_move = value, cell
+            if value > alpha:
+                alpha = value
+                if alpha >= beta:
+                    break
+
+        if best <= alpha0:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        if len(self.table) < MAX_TABLE_ENTRIES:
+            self.table[key] = (depth, best, flag, best_move)
+        if root:
+            return best, best_move
+        return best
+
+    def _ghosts(self, index, depth, alpha, beta):
+        # Các ghost lần lượt đi (tầng MIN) rồi tới lượt Pacman kế tiếp
+        while index < len(self.ghost_cells) and (
+            not self.ghost_turn or self.ghost_cells[index] < 0
+        ):
+            index += 1
+        if index >= len(self.ghost_cells):
+            self.ghost_turn = not self.ghost_turn
+            self.hash ^= self.z_turn
+            value = self._pacman(depth - 1, alpha, beta)
+            self.ghost_turn = not self.ghost_turn
+            self.hash ^= self.z_turn
+            return value
+
+        self._tick()
+        origin = self.ghost_cells[index]
+        pac = self.pac
+        moves = sorted(
+            self.graph.neighbors[origin],
+            key=lambda v: self._distance(v, pac),
+        )
+        best = WIN + 1
+        z = self.z_ghost[index]
+        for cell in moves:
+            self.ghost_cells[index] = cell
+            self.hash ^= z[origin] ^ z[cell]
+            if cell == pac:
+                if self.fright[index]:
+                    # Ghost hoảng sợ lao vào Pacman thì bị ăn
+                    self.ghost_cells[index] = -1
+                    self.hash ^= z[cell] ^ self.z_fright[index]
+                    value = GHOST_REWARD + self._ghosts(
+                        index + 1,
+                        depth,
+                        alpha - GHOST_REWARD,
+                        beta - GHOST_REWARD,
+                    )
+                    self.hash ^= z[cell] ^ self.z_fright[index]
+                else:
+                    value = DEATH
+            else:
+                value = self._ghosts(index + 1, depth, alpha, beta)
+            self.hash ^= z[origin] ^ z[cell]
+            self.ghost_cells[index] = origin
+            if value < best:
+                best = value
+            if value < beta:
+                beta = value
+                if alpha >= beta:
+                    break
+        return best
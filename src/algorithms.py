@@ -1,10 +1,375 @@
-from math import sqrt
 from collections import deque
+from array import array
 import random
 import heapq
+import threading
+import numpy as np
+from bitboard import get_board
 
 directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
 
+UNREACHABLE = 0xFFFF
+MAX_CACHED_GRIDS = 8
+# Bảng khoảng cách mọi cặp tốn size^2 * 2 byte: bỏ qua trên map quá lớn
+MAX_TABLE_CELLS = 2048
+
+
+class GridGraph:
+    # Đồ thị lưới biên dịch một lần cho mỗi bố cục tường: id ô là số nguyên,
+    # láng giềng tính sẵn, buffer visited/parent/cost dùng lại giữa các lần tìm
+    def __init__(self, map_data):
+        self.rows, self.cols = len(map_data), len(map_data[0])
+        self.walkable = bytearray(self.rows * self.cols)
+        self.index = [-1] * (self.rows * self.cols)
+        self.cells = []
+        # Đánh số theo (x, y) để thứ tự id trùng thứ tự tuple trong heap
+        for x in range(self.cols):
+            for y in range(self.rows):
+                if x < len(map_data[y]) and map_data[y][x] != "#":
+                    self.walkable[y * self.cols + x] = 1
+                    self.index[y * self.cols + x] = len(self.cells)
+                    self.cells.append((x, y))
+        self.size = n = len(self.cells)
+        self.xs = array("i", (x for x, _ in self.cells))
+        self.ys = array("i", (y for _, y in self.cells))
+        self.neighbors = tuple(
+            tuple(
+                self.cell_id((x + dx, y + dy))
+                for dx, dy in directions
+                if self.cell_id((x + dx, y + dy)) >= 0
+            )
+            for x, y in self.cells
+        )
+
+        # Phạt ngõ cụt chỉ phụ thuộc tường nên tính một lần cho mỗi map
+        self.np_xs = np.frombuffer(self.xs, dtype=np.intc)
+        self.np_ys = np.frombuffer(self.ys, dtype=np.intc)
+        degree = np.array([len(nbs) for nbs in self.neighbors], dtype=np.int64)
+        self.exits = degree
+        self.dead_end_cost = np.where(
+            degree <= 1, 50, np.where(degree == 2, 10, 0)
+        )
+        self._danger_key = None
+        self._danger_field = None
+        self._danger_costs = None
+        self._ghost_key = None
+        self._ghost_distance = None
+        self.flow = None
+        self.junctions = None
+        self.landmarks = None
+        self.hierarchy = None
+        self.expanded = 0
+
+        self.stamp = 0
+        self.seen = [0] * n
+        self.parent = [-1] * n
+        self.cost = [0] * n
+        self.block_stamp = 0
+        self.blocked = [0] * n
+        self._distances = None
+
+    def cell_id(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return self.index[y * self.cols + x]
+        return -1
+
+    def new_search(self):
+        # Đổi stamp thay vì xóa buffer: seen[c] == stamp nghĩa là đã thăm
+        self.stamp += 1
+        return self.stamp
+
+    def bfs_from(self, source_id):
+        return self.bfs_from_many([source_id])
+
+    def bfs_from_many(self, source_ids):
+        # BFS đa nguồn: khoảng cách từ mỗi ô tới nguồn gần nhất
+        dist = [UNREACHABLE] * self.size
+        neighbors = self.neighbors
+        frontier = []
+        for source_id in source_ids:
+            if dist[source_id] != 0:
+                dist[source_id] = 0
+                frontier.append(source_id)
+        depth = 0
+        while frontier:
+            depth += 1
+            next_frontier = []
+            for cell in frontier:
+                for nb in neighbors[cell]:
+                    if dist[nb] == UNREACHABLE:
+                        dist[nb] = depth
+                        next_frontier.append(nb)
+            frontier = next_frontier
+        return dist
+
+    def manhattan_to(self, goal_id):
+        return (
+            np.abs(self.np_xs - self.xs[goal_id])
+            + np.abs(self.np_ys - self.ys[goal_id])
+        ).tolist()
+
+    def step_costs(self, cost_field):
+        # Chi phí từng ô dạng list (đọc từng phần tử nhanh hơn mảng NumPy);
+        # trường của danger_field chỉ chuyển một lần cho cả tick
+        if cost_field is self._danger_field:
+            if self._danger_costs is None:
+                self._danger_costs = cost_field.tolist()
+            return self._danger_costs
+        return cost_field.tolist()
+
+    def block_around(self, positions, radius):
+        self.block_stamp += 1
+        stamp = self.block_stamp
+        for gx, gy in positions:
+            for dx in range(-radius, radius + 1):
+                span = radius - abs(dx)
+                for dy in range(-span, span + 1):
+                    cid = self.cell_id((gx + dx, gy + dy))
+                    if cid >= 0:
+                        self.blocked[cid] = stamp
+        return stamp
+
+    def valid_directions(self, start, block_stamp=None):
+        cid = self.cell_id(start)
+        if cid < 0:
+            return []
+        return [
+            (self.xs[nb] - self.xs[cid], self.ys[nb] - self.ys[cid])
+            for nb in self.neighbors[cid]
+            if block_stamp is None or self.blocked[nb] != block_stamp
+        ]
+
+    def first_step(self, start_id, goal_id):
+        node = goal_id
+        parent = self.parent
+        while parent[node] != start_id:
+            node = parent[node]
+            if node < 0:
+                return None
+        return (
+            self.xs[node] - self.xs[start_id],
+            self.ys[node] - self.ys[start_id],
+        )
+
+    def path_to(self, start_id, goal_id):
+        path = []
+        node = goal_id
+        while node != start_id:
+            path.append(self.cells[node])
+            node = self.parent[node]
+            if node < 0:
+                return []
+        path.reverse()
+        return path
+
+    @property
+    def distances(self):
+        if self._distances is None and self.size <= MAX_TABLE_CELLS:
+            self._distances = DistanceTable(self)
+        return self._distances
+
+
+class DistanceTable:
+    # Bảng khoảng cách mê cung giữa mọi cặp ô trống, BFS một lần khi nạp map
+    def __init__(self, graph):
+        self.graph = graph
+        self.cells = graph.cells
+        n = self.size = graph.size
+        neighbors = graph.neighbors
+        dist = self.dist = array("H", [UNREACHABLE]) * (n * n)
+        for source in range(n):
+            base = source * n
+            dist[base + source] = 0
+            frontier = [source]
+            depth = 0
+            while frontier:
+                depth += 1
+                next_frontier = []
+                for cell in frontier:
+                    for nb in neighbors[cell]:
+                        if dist[base + nb] == UNREACHABLE:
+                            dist[base + nb] = depth
+                            next_frontier.append(nb)
+                frontier = next_frontier
+
+    def cell_id(self, pos):
+        return self.graph.cell_id(pos)
+
+    def distance(self, a, b):
+        i, j = self.graph.cell_id(a), self.graph.cell_id(b)
+        if i < 0 or j < 0:
+            return None
+        d = self.dist[i * self.size + j]
+        return float("inf") if d == UNREACHABLE else d
+
+
+class FlowField:
+    # Một BFS ngược từ ô của Pacman trả lời "đi hướng nào tới Pacman"
+    # cho mọi ghost cùng lúc
+    def __init__(self, graph):
+        self.graph = graph
+        self.target_id = -1
+        self.dist = [UNREACHABLE] * graph.size
+
+    def update(self, target):
+        target_id = self.graph.cell_id(target)
+        if target_id == self.target_id:
+            return
+        self.target_id = target_id
+        if target_id < 0:
+            self.dist = [UNREACHABLE] * self.graph.size
+        else:
+            self.dist = self.graph.bfs_from(target_id)
+
+    def distance(self, pos):
+        cid = self.graph.cell_id(pos)
+        if cid < 0 or self.target_id < 0:
+            return None
+        d = self.dist[cid]
+        return float("inf") if d == UNREACHABLE else d
+
+    def toward(self, pos):
+        # Láng giềng đầu tiên (theo thứ tự directions) gần target hơn,
+        # trùng với bước đầu mà bfs_direction sẽ chọn
+        graph = self.graph
+        cid = graph.cell_id(pos)
+        if cid < 0 or self.target_id < 0:
+            return None
+        d = self.dist[cid]
+        if d == UNREACHABLE or d == 0:
+            return None
+        for nb in graph.neighbors[cid]:
+            if self.dist[nb] < d:
+                return (
+                    graph.xs[nb] - graph.xs[cid],
+                    graph.ys[nb] - graph.ys[cid],
+                )
+        return None
+
+
+class GridCache(threading.local):
+    # Mỗi luồng một bộ cache: buffer tìm kiếm của GridGraph không an toàn
+    # khi luồng lập kế hoạch nền và vòng lặp game dùng chung
+    def __init__(self):
+        self.grids = {}
+        self.last_map = None
+        self.last_grid = None
+
+
+_cache = GridCache()
+
+
+def wall_key(map_data):
+    return (len(map_data[0]),) + tuple(
+        "".join("#" if tile == "#" else " " for tile in row) for row in map_data
+    )
+
+
+def get_grid(map_data):
+    # Ăn pellet không đổi tường nên cache theo bố cục tường của map
+    cache = _cache
+    if map_data is cache.last_map:
+        return cache.last_grid
+    key = wall_key(map_data)
+    grids = cache.grids
+    grid = grids.get(key)
+    if grid is None:
+        if len(grids) >= MAX_CACHED_GRIDS:
+            del grids[next(iter(grids))]
+        grid = GridGraph(map_data)
+        grids[key] = grid
+    cache.last_map, cache.last_grid = map_data, grid
+    return grid
+
+
+def danger_field(map_data, ghost_positions=None):
+    # Chi phí bước vào từng ô: 1 + phạt ngõ cụt + phạt theo vùng quanh ghost,
+    # tính một lần mỗi tick rồi truyền cho các thuật toán tìm đường
+    graph = get_grid(map_data)
+    key = tuple(ghost_positions) if ghost_positions else ()
+    if key == graph._danger_key:
+        return graph._danger_field
+    field = graph.dead_end_cost + 1
+    if key and graph.size:
+        ghosts = np.array(key, dtype=np.int64)
+        dist = np.abs(graph.np_xs[:, None] - ghosts[:, 0]) + np.abs(
+            graph.np_ys[:, None] - ghosts[:, 1]
+        )
+        field = field + np.where(
+            dist <= 2, 100, np.where(dist <= 5, 20, 0)
+        ).sum(axis=1)
+    graph._danger_key, graph._danger_field = key, field
+    graph._danger_costs = None
+    return field
+
+
+def ghost_distance_field(map_data, ghost_positions=None):
+    # Khoảng cách mê cung từ mỗi ô tới ghost nguy hiểm gần nhất (một BFS đa
+    # nguồn), cache theo vị trí ghost nên mỗi tick chỉ tính một lần. Ô ghost
+    # không tới được (hoặc không có ghost) mang giá trị UNREACHABLE
+    graph = get_grid(map_data)
+    key = tuple(ghost_positions) if ghost_positions else ()
+    if key == graph._ghost_key:
+        return graph._ghost_distance
+    sources = [graph.cell_id(pos) for pos in key]
+    field = np.array(
+        graph.bfs_from_many([cid for cid in sources if cid >= 0]),
+        dtype=np.int64,
+    )
+    graph._ghost_key, graph._ghost_distance = key, field
+    return field
+
+
+def distances_from(map_data, pos):
+    # Khoảng cách mê cung từ pos tới mọi ô dưới dạng mảng NumPy: cắt một
+    # hàng của bảng khoảng cách nếu có, không thì BFS
+    graph = get_grid(map_data)
+    cid = graph.cell_id(pos)
+    if cid < 0:
+        return np.full(graph.size, UNREACHABLE, dtype=np.int64)
+    table = graph.distances
+    if table is not None:
+        row = np.frombuffer(
+            table.dist,
+            dtype=np.uint16,
+            count=graph.size,
+            offset=cid * graph.size * 2,
+        )
+        return row.astype(np.int64)
+    return np.array(graph.bfs_from(cid), dtype=np.int64)
+
+
+def flow_field(map_data, target):
+    # Chỉ tính lại khi Pacman sang ô mới, dùng chung cho mọi ghost trong tick
+    graph = get_grid(map_data)
+    if graph.flow is None:
+        graph.flow = FlowField(graph)
+    graph.flow.update(target)
+    return graph.flow
+
+
+def flow_direction(map_data, start, goal):
+    if start == goal:
+        return random.choice(directions)
+    move = flow_field(map_data, goal).toward(start)
+    if move is None:
+        valid_directions = get_grid(map_data).valid_directions(start)
+        return random.choice(valid_directions) if valid_directions else (0, 0)
+    return move
+
+
+def get_distance_table(map_data):
+    return get_grid(map_data).distances
+
+
+def maze_distance(map_data, a, b):
+    table = get_distance_table(map_data)
+    dist = table.distance(a, b) if table else None
+    if dist is None:
+        return heuristic(a, b)
+    return dist
+
 
 def count_open_neighbors(map_data, x, y):
     count = 0
@@ -17,36 +382,31 @@ def count_open_neighbors(map_data, x, y):
 
 
 def bfs_len(map_data, start, goal):
-    queue = deque([start])
-    visited = {start: None}
-    rows, cols = len(map_data), len(map_data[0])
-
-    while queue:
-        current = queue.popleft()
-        if current == goal:
-            break
-        for dx, dy in directions:
-            nx, ny = current[0] + dx, current[1] + dy
-            if 0 <= ny < rows and 0 <= nx < cols:
-                if map_data[ny][nx] != "#" and (nx, ny) not in visited:
-                    visited[(nx, ny)] = current
-                    queue.append((nx, ny))
-
-    if goal not in visited:
-        return float("inf")
-
-    length = 0
-    node = goal
-    while visited[node] is not None:
-        node = visited[node]
-        length += 1
-    return length
+    table = get_distance_table(map_data)
+    dist = table.distance(start, goal) if table else None
+    if dist is not None:
+        return dist
+    return get_board(map_data).distance(start, goal)
 
 
 def near_pacman(map_data, start, pacman_pos):
     best_dir = (1, 0)
     max_dist = float("inf")
 
+    flow = flow_field(map_data, pacman_pos)
+    if flow.target_id >= 0:
+        graph = flow.graph
+        cid = graph.cell_id(start)
+        if cid >= 0:
+            for nb in graph.neighbors[cid]:
+                if flow.dist[nb] != UNREACHABLE and flow.dist[nb] < max_dist:
+                    max_dist = flow.dist[nb]
+                    best_dir = (
+                        graph.xs[nb] - graph.xs[cid],
+                        graph.ys[nb] - graph.ys[cid],
+                    )
+            return best_dir
+
     for dx, dy in directions:
         nx, ny = start[0] + dx, start[1] + dy
         if 0 <= ny < len(map_data) and 0 <= nx < len(map_data[0]):
@@ -60,304 +420,336 @@ def near_pacman(map_data, start, pacman_pos):
 
 
 def dfs_shortest_path(map_data, start, goal):
-    stack = [start]
-    visited = {start: None}
-    rows = len(map_data)
-    cols = len(map_data[0])
+    graph = get_grid(map_data)
+    start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+    if start_id < 0 or goal_id < 0:
+        return []
+    stamp = graph.new_search()
+    seen, parent, neighbors = graph.seen, graph.parent, graph.neighbors
+    seen[start_id] = stamp
+    parent[start_id] = -1
+    stack = [start_id]
     while stack:
         current = stack.pop()
-        if current == goal:
+        if current == goal_id:
             break
-        for dx, dy in directions:
-            if 0 <= current[0] + dx < cols and 0 <= current[1] + dy < rows:
-                nx, ny = current[0] + dx, current[1] + dy
-                if map_data[ny][nx] != "#" and (nx, ny) not in visited:
-                    visited[(nx, ny)] = current
-                    stack.append((nx, ny))
-    path = []
-    node = goal
-    while node != start:
-        path.append(node)
-        node = visited.get(node)
-        if node is None:
-            return []
-    path.reverse()
-    return path
+        for nb in neighbors[current]:
+            if seen[nb] != stamp:
+                seen[nb] = stamp
+                parent[nb] = current
+                stack.append(nb)
+    if seen[goal_id] != stamp:
+        return []
+    return graph.path_to(start_id, goal_id)
 
 
 def bfs_shortest_path(map_data, start, goal):
-    queue = deque()
-    queue.append(start)
-    visited = {start: None}
-    rows = len(map_data)
-    cols = len(map_data[0])
+    graph = get_grid(map_data)
+    start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+    if start_id < 0 or goal_id < 0:
+        return []
+    stamp = graph.new_search()
+    seen, parent, neighbors = graph.seen, graph.parent, graph.neighbors
+    seen[start_id] = stamp
+    parent[start_id] = -1
+    queue = deque([start_id])
     while queue:
         current = queue.popleft()
-        if current == goal:
+        if current == goal_id:
             break
-        for dx, dy in directions:
-            nx, ny = current[0] + dx, current[1] + dy
-            if 0 <= nx < cols and 0 <= ny < rows:
-                if map_data[ny][nx] != "#" and (nx, ny) not in visited:
-                    visited[(nx, ny)] = current
-                    queue.append((nx, ny))
-    path = []
-    node = goal
-    while node != start:
-        path.append(node)
-        node = visited.get(node)
-        if node is None:
-            return []
-    path.reverse()
-    return path
+        for nb in neighbors[current]:
+            if seen[nb] != stamp:
+                seen[nb] = stamp
+                parent[nb] = current
+                queue.append(nb)
+    if seen[goal_id] != stamp:
+        return []
+    return graph.path_to(start_id, goal_id)
 
 
-def ucs_direction(map_data, start, goal, ghost_positions=None):
+def ucs_direction(map_data, start, goal, ghost_positions=None, cost_field=None):
     if ghost_positions is None:
         ghost_positions = []
     if start == goal:
         return random.choice(directions)
-    rows, cols = len(map_data), len(map_data[0])
-    queue = []
-    heapq.heappush(queue, (0, start))
-    visited = {start: None}
-    costs = {start: 0}
+    graph = get_grid(map_data)
+    start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+    if start_id < 0 or goal_id < 0:
+        valid_directions = graph.valid_directions(start)
+        return random.choice(valid_directions) if valid_directions else (0, 0)
+    stamp = graph.new_search()
+    seen, parent, costs = graph.seen, graph.parent, graph.cost
+    neighbors = graph.neighbors
+    if cost_field is None:
+        cost_field = danger_field(map_data, ghost_positions)
+    step_cost = graph.step_costs(cost_field)
+    seen[start_id] = stamp
+    parent[start_id] = -1
+    costs[start_id] = 0
+    queue = [(0, start_id)]
     max_nodes = 1500  # Tăng max_nodes
     node_count = 0
 
     while queue and node_count < max_nodes:
+        # Đếm cả lượt pop đã lỗi thời như bản cũ để giới hạn max_nodes giữ
+        # nguyên ý nghĩa
         node_count += 1
         current_cost, current = heapq.heappop(queue)
-        if current == goal:
+        if current_cost > costs[current]:
+            continue
+        if current == goal_id:
             break
-        for dx, dy in directions:
-            nx, ny = current[0] + dx, current[1] + dy
-            neighbor = (nx, ny)
-            if 0 <= ny < rows and 0 <= nx < cols and map_data[ny][nx] != "#":
-                ghost_cost = 0
-                for ghost_pos in ghost_positions:
-                    dist_to_ghost = heuristic(neighbor, ghost_pos)
-                    if dist_to_ghost <= 2:
-                        ghost_cost += 100  # Giảm chi phí
-                    elif dist_to_ghost <= 5:
-                        ghost_cost += 20
-                open_neighbors = count_open_neighbors(map_data, nx, ny)
-                dead_end_cost = (
-                    50
-                    if open_neighbors <= 1
-                    else 10 if open_neighbors == 2 else 0
-                )  # Giảm chi phí
-                new_cost = costs[current] + 1 + ghost_cost + dead_end_cost
-                if neighbor not in costs or new_cost < costs[neighbor]:
-                    costs[neighbor] = new_cost
-                    visited[neighbor] = current
-                    heapq.heappush(queue, (new_cost, neighbor))
-
-    if goal not in visited:
-        valid_directions = [
-            (dx, dy)
-            for dx, dy in directions
-            if 0 <= start[1] + dy < rows
-            and 0 <= start[0] + dx < cols
-            and map_data[start[1] + dy][start[0] + dx] != "#"
-        ]
+        for nb in neighbors[current]:
+            new_cost = current_cost + step_cost[nb]
+            if seen[nb] != stamp or new_cost < costs[nb]:
+                seen[nb] = stamp
+                costs[nb] = new_cost
+                parent[nb] = current
+                heapq.heappush(queue, (new_cost, nb))
+
+    step = (
+        graph.first_step(start_id, goal_id) if seen[goal_id] == stamp else None
+    )
+    if step is None:
+        valid_directions = graph.valid_directions(start)
         return random.choice(valid_directions) if valid_directions else (0, 0)
-
-    node = goal
-    while visited[node] != start:
-        node = visited[node]
-        if node is None:
-            valid_directions = [
-                (dx, dy)
-                for dx, dy in directions
-                if 0 <= start[1] + dy < rows
-                and 0 <= start[0] + dx < cols
-                and map_data[start[1] + dy][start[0] + dx] != "#"
-            ]
-            return (
-                random.choice(valid_directions) if valid_directions else (0, 0)
-            )
-    dx = node[0] - start[0]
-    dy = node[1] - start[1]
-    return (dx, dy)
+    return step
 
 
 def heuristic(a, b):
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
 
-def a_star_direction(map_data, start, goal, ghost_positions=None):
+def a_star_direction(
+    map_data, start, goal, ghost_positions=None, cost_field=None
+):
     if ghost_positions is None:
         ghost_positions = []
-    rows, cols = len(map_data), len(map_data[0])
-    open_set = []
-    heapq.heappush(open_set, (0 + heuristic(start, goal), 0, start))
-    came_from = {}
-    g_score = {start: 0}
-    max_nodes = 2000  # Tăng max_nodes
+    graph = get_grid(map_data)
+    start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+    if start_id < 0 or goal_id < 0 or start_id == goal_id:
+        valid_directions = graph.valid_directions(start)
+        return random.choice(valid_directions) if valid_directions else (0, 0)
+    if cost_field is None:
+        cost_field = danger_field(map_data, ghost_positions)
+    step = a_star_search(
+        graph,
+        start_id,
+        goal_id,
+        graph.step_costs(cost_field),
+        graph.manhattan_to(goal_id),
+    )
+    if step is None:
+        valid_directions = graph.valid_directions(start)
+        return random.choice(valid_directions) if valid_directions else (0, 0)
+    return step
+
+
+def a_star_search(graph, start_id, goal_id, step_cost, h, max_nodes=2000):
+    # h[c] là heuristic từ ô c tới goal; trả về bước đầu tiên hoặc None
+    stamp = graph.new_search()
+    seen, parent, g_score = graph.seen, graph.parent, graph.cost
+    neighbors = graph.neighbors
+    seen[start_id] = stamp
+    parent[start_id] = -1
+    g_score[start_id] = 0
+    open_set = [(h[start_id], 0, start_id)]
     node_count = 0
     while open_set and node_count < max_nodes:
         node_count += 1
         _, current_g, current = heapq.heappop(open_set)
-        if current == goal:
+        if current_g > g_score[current]:
+            continue
+        if current == goal_id:
             break
-        for dx, dy in directions:
-            nx, ny = current[0] + dx, current[1] + dy
-            neighbor = (nx, ny)
-            if 0 <= ny < rows and 0 <= nx < cols and map_data[ny][nx] != "#":
-                ghost_cost = 0
-                for ghost_pos in ghost_positions:
-                    dist_to_ghost = heuristic(neighbor, ghost_pos)
-                    if dist_to_ghost <= 2:
-                        ghost_cost += 100  # Giảm chi phí
-                    elif dist_to_ghost <= 5:
-                        ghost_cost += 20
-                open_neighbors = count_open_neighbors(map_data, nx, ny)
-                dead_end_cost = (
-                    50
-                    if open_neighbors <= 1
-                    else 10 if open_neighbors == 2 else 0
-                )  # Giảm chi phí
-                tentative_g_score = current_g + 1 + ghost_cost + dead_end_cost
-                if (
-                    neighbor not in g_score
-                    or tentative_g_score < g_score[neighbor]
-                ):
-                    g_score[neighbor] = tentative_g_score
-                    f_score = tentative_g_score + heuristic(neighbor, goal)
-                    heapq.heappush(
-                        open_set, (f_score, tentative_g_score, neighbor)
-                    )
-                    came_from[neighbor] = current
-    if goal not in came_from:
-        valid_directions = [
-            (dx, dy)
-            for dx, dy in directions
-            if 0 <= start[1] + dy < rows
-            and 0 <= start[0] + dx < cols
-            and map_data[start[1] + dy][start[0] + dx] != "#"
-        ]
-        return random.choice(valid_directions) if valid_directions else (0, 0)
-    node = goal
-    while came_from[node] != start:
-        node = came_from[node]
-        if node is None:
-            valid_directions = [
-                (dx, dy)
-                for dx, dy in directions
-                if 0 <= start[1] + dy < rows
-                and 0 <= start[0] + dx < cols
-                and map_data[start[1] + dy][start[0] + dx] != "#"
-            ]
-            return (
-                random.choice(valid_directions) if valid_directions else (0, 0)
-            )
-    dx = node[0] - start[0]
-    dy = node[1] - start[1]
-    return (dx, dy)
+        for nb in neighbors[current]:
+            tentative_g_score = current_g + step_cost[nb]
+            if seen[nb] != stamp or tentative_g_score < g_score[nb]:
+                seen[nb] = stamp
+                g_score[nb] = tentative_g_score
+                parent[nb] = current
+                f_score = tentative_g_score + h[nb]
+                heapq.heappush(open_set, (f_score, tentative_g_score, nb))
+    graph.expanded = node_count
+    if seen[goal_id] != stamp:
+        return None
+    return graph.first_step(start_id, goal_id)
 
 
 def dfs_direction(map_data, start, goal, ghost_positions=None, danger_range=2):
-    if ghost_positions is None:
-        ghost_positions = []
-
-    def is_safe(pos):
-        return all(heuristic(pos, g) > danger_range for g in ghost_positions)
-
     if start == goal:
         return random.choice(directions)
+    move = dfs_step(map_data, start, goal, ghost_positions, danger_range)
+    if move is None:
+        return _blocked_fallback(map_data, start, ghost_positions, danger_range)
+    return move
 
-    rows, cols = len(map_data), len(map_data[0])
-    stack = [start]
-    visited = {start: None}
 
+def dfs_step(map_data, start, goal, ghost_positions=None, danger_range=2):
+    # Bước đầu theo DFS, None nếu không tới được goal
+    if ghost_positions is None:
+        ghost_positions = []
+
+    graph = get_grid(map_data)
+    start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+    block = graph.block_around(ghost_positions, danger_range)
+    stamp = graph.new_search()
+    seen, parent, blocked = graph.seen, graph.parent, graph.blocked
+    neighbors = graph.neighbors
+    stack = []
+    if start_id >= 0:
+        seen[start_id] = stamp
+        parent[start_id] = -1
+        stack.append(start_id)
+
+    node_count = 0
     while stack:
         current = stack.pop()
-        if current == goal:
+        node_count += 1
+        if current == goal_id:
             break
 
-        for dx, dy in directions:
-            nx, ny = current[0] + dx, current[1] + dy
-            neighbor = (nx, ny)
-            if (
-                0 <= ny < rows
-                and 0 <= nx < cols
-                and map_data[ny][nx] != "#"
-                and neighbor not in visited
-                and is_safe(neighbor)
-            ):
-                visited[neighbor] = current
-                stack.append(neighbor)
+        for nb in neighbors[current]:
+            if seen[nb] != stamp and blocked[nb] != block:
+                seen[nb] = stamp
+                parent[nb] = current
+                stack.append(nb)
+    graph.expanded = node_count
 
     # Không đến được goal
-    if goal not in visited:
-        valid_dirs = [
-            (dx, dy)
-            for dx, dy in directions
-            if 0 <= start[1] + dy < rows
-            and 0 <= start[0] + dx < cols
-            and map_data[start[1] + dy][start[0] + dx] != "#"
-            and is_safe((start[0] + dx, start[1] + dy))
-        ]
-        return random.choice(valid_dirs) if valid_dirs else (0, 0)
+    if goal_id < 0 or start_id == goal_id or seen[goal_id] != stamp:
+        return None
 
     # Truy vết hướng
-    node = goal
-    while visited[node] != start:
-        node = visited[node]
-    dx = node[0] - start[0]
-    dy = node[1] - start[1]
-    return (dx, dy)
+    return graph.first_step(start_id, goal_id)
 
 
 def bfs_direction(map_data, start, goal, ghost_positions=None, danger_range=2):
-    if ghost_positions is None:
-        ghost_positions = []
-
-    def is_safe(pos):
-        return all(heuristic(pos, g) > danger_range for g in ghost_positions)
-
     if start == goal:
         return random.choice(directions)
+    move = bfs_step(map_data, start, goal, ghost_positions, danger_range)
+    if move is None:
+        return _blocked_fallback(map_data, start, ghost_positions, danger_range)
+    return move
 
-    rows, cols = len(map_data), len(map_data[0])
-    queue = deque([start])
-    visited = {start: None}
 
+def bfs_step(map_data, start, goal, ghost_positions=None, danger_range=2):
+    # Bước đầu theo BFS, None nếu không tới được goal
+    if ghost_positions is None:
+        ghost_positions = []
+
+    graph = get_grid(map_data)
+    start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+    block = graph.block_around(ghost_positions, danger_range)
+    stamp = graph.new_search()
+    seen, parent, blocked = graph.seen, graph.parent, graph.blocked
+    neighbors = graph.neighbors
+    queue = deque()
+    if start_id >= 0:
+        seen[start_id] = stamp
+        parent[start_id] = -1
+        queue.append(start_id)
+
+    node_count = 0
     while queue:
         current = queue.popleft()
-        if current == goal:
+        node_count += 1
+        if current == goal_id:
             break
 
-        for dx, dy in directions:
-            nx, ny = current[0] + dx, current[1] + dy
-            neighbor = (nx, ny)
-            if (
-                0 <= ny < rows
-                and 0 <= nx < cols
-                and map_data[ny][nx] != "#"
-                and neighbor not in visited
-                and is_safe(neighbor)
-            ):
-                visited[neighbor] = current
-                queue.append(neighbor)
+        for nb in neighbors[current]:
+            if seen[nb] != stamp and blocked[nb] != block:
+                seen[nb] = stamp
+                parent[nb] = current
+                queue.append(nb)
+    graph.expanded = node_count
 
     # Nếu không tới được goal
-    if goal not in visited:
-        valid_dirs = [
-            (dx, dy)
-            for dx, dy in directions
-            if 0 <= start[1] + dy < rows
-            and 0 <= start[0] + dx < cols
-            and map_data[start[1] + dy][start[0] + dx] != "#"
-            and is_safe((start[0] + dx, start[1] + dy))
-        ]
-        return random.choice(valid_dirs) if valid_dirs else (0, 0)
+    if goal_id < 0 or start_id == goal_id or seen[goal_id] != stamp:
+        return None
 
     # Truy vết lại hướng đi
-    node = goal
-    while visited[node] != start:
-        node = visited[node]
-    dx = node[0] - start[0]
-    dy = node[1] - start[1]
-    return (dx, dy)
+    return graph.first_step(start_id, goal_id)
+
+
+def _blocked_fallback(map_data, start, ghost_positions, danger_range):
+    # Hướng ngẫu nhiên không đi vào vùng quanh ghost
+    graph = get_grid(map_data)
+    block = graph.block_around(ghost_positions or [], danger_range)
+    valid_dirs = graph.valid_directions(start, block)
+    return random.choice(valid_dirs) if valid_dirs else (0, 0)
+
+
+def nearest_target(
+    map_data,
+    start,
+    ghost_positions=None,
+    hunt=None,
+    pellets=True,
+    power_bonus=None,
+    danger_range=2,
+    ghost_penalty=50,
+):
+    # Một lần BFS từ start thay cho chọn mục tiêu + tìm đường riêng: chấm điểm
+    # pellet / power pellet / ghost bị hoảng sợ ngay khi chạm tới, dừng khi
+    # tầng kế tiếp không thể có điểm tốt hơn. Trả về (mục tiêu, bước đầu)
+    graph = get_grid(map_data)
+    start_id = graph.cell_id(start)
+    if start_id < 0:
+        return None, None
+    if ghost_positions is None:
+        ghost_positions = []
+    hunt = {graph.cell_id(pos) for pos in hunt or ()}
+
+    # Ô cách ghost <= 3 bước (BFS đa nguồn trên bitboard) bị phạt điểm
+    board = get_board(map_data)
+    near = 0
+    for gp in ghost_positions:
+        near |= board.bit(gp)
+    near &= board.open
+    for _ in range(3):
+        near |= board.expand(near)
+
+    min_bonus = min(0, power_bonus or 0)
+    block = graph.block_around(ghost_positions, danger_range)
+    stamp = graph.new_search()
+    seen, parent, blocked = graph.seen, graph.parent, graph.blocked
+    neighbors, xs, ys = graph.neighbors, graph.xs, graph.ys
+    seen[start_id] = stamp
+    parent[start_id] = -1
+    frontier = [start_id]
+    depth = 0
+    best_score, best_id = float("inf"), -1
+    expanded = 0
+    while frontier and depth + min_bonus <= best_score:
+        expanded += len(frontier)
+        for cid in frontier if depth else ():
+            x, y = xs[cid], ys[cid]
+            tile = map_data[y][x]
+            if cid in hunt or (pellets and tile == "."):
+                score = depth
+            elif tile == "o" and power_bonus is not None:
+                score = depth + power_bonus
+            else:
+                continue
+            if near & board.bit((x, y)):
+                score += ghost_penalty
+            # Hòa điểm thì chọn (y, x) nhỏ nhất như find_nearest_item
+            if score < best_score or (
+                score == best_score and (y, x) < (ys[best_id], xs[best_id])
+            ):
+                best_score, best_id = score, cid
+        next_frontier = []
+        for cid in frontier:
+            for nb in neighbors[cid]:
+                if seen[nb] != stamp and blocked[nb] != block:
+                    seen[nb] = stamp
+                    parent[nb] = cid
+                    next_frontier.append(nb)
+        frontier = next_frontier
+        depth += 1
+    graph.expanded = expanded
+
+    if best_id < 0:
+        return None, None
+    return graph.cells[best_id], graph.first_step(start_id, best_id)
@@ -0,0 +1,118 @@
+import heapq
+import time
+from array import array
+from algorithms import get_grid
+from landmarks import get_landmarks
+
+PLAN_BUDGET_MS = 2.0
+# Số nút mở rộng giữa hai lần đọc đồng hồ
+CHECK_EVERY = 64
+
+
+class AnytimePlanner:
+    # A* (hoặc UCS khi use_heuristic=False) có ngân sách thời gian mỗi lần
+    # gọi. Hết giờ thì trả về bước đầu tới ô gần goal nhất đã mở rộng và giữ
+    # nguyên hàng đợi để frame sau tìm tiếp; finished cho biết đã xong chưa
+    def __init__(self, budget_ms=PLAN_BUDGET_MS, use_heuristic=True):
+        self.budget_ms = budget_ms
+        self.use_heuristic = use_heuristic
+        self.graph = None
+        self.start_id = -1
+        self.goal_id = -1
+        self.field = None
+        self.finished = True
+        self.expanded = 0
+        self.last_expanded = 0
+        self.stamp = 0
+
+    def reset(self, graph, start_id, goal_id, cost_field, h=None):
+        if graph is not self.graph:
+            # Buffer riêng: các hàm tìm đường khác dùng chung buffer của
+            # GridGraph giữa hai frame sẽ ghi đè lượt tìm đang dở
+            self.graph = graph
+            self.seen = array("I", [0]) * graph.size
+            self.parent = array("i", [-1]) * graph.size
+            self.g = [0] * graph.size
+        self.stamp += 1
+        self.start_id, self.goal_id = start_id, goal_id
+        self.field = cost_field
+        self.step_cost = graph.step_costs(cost_field)
+        # h=None: UCS; ô "gần goal nhất" khi đó xét theo Manhattan
+        self.h = h
+        self.closeness = h if h is not None else graph.manhattan_to(goal_id)
+        self.seen[start_id] = self.stamp
+        self.parent[start_id] = -1
+        self.g[start_id] = 0
+        self.heap = [(0, 0, start_id)]
+        self.best = start_id
+        self.finished = False
+        self.expanded = 0
+
+    def _search(self, deadline):
+        graph = self.graph
+        neighbors = graph.neighbors
+        seen, parent, g_score = self.seen, self.parent, self.g
+        step_cost, h, closeness = self.step_cost, self.h, self.closeness
+        stamp, goal_id, heap = self.stamp, self.goal_id, self.heap
+        best = self.best
+        count = 0
+        while heap:
+            count += 1
+            if count % CHECK_EVERY == 0 and time.perf_counter() > deadline:
+                break
+            _, current_g, current = heapq.heappop(heap)
+            if current_g > g_score[current]:
+                continue
+            self.expanded += 1
+            if current == goal_id:
+                best = current
+                self.finished = True
+                break
+            if closeness[current] < closeness[best]:
+                best = current
+            for nb in neighbors[current]:
+                new_g = current_g + step_cost[nb]
+                if seen[nb] != stamp or new_g < g_score[nb]:
+                    seen[nb] = stamp
+                    g_score[nb] = new_g
+                    parent[nb] = current
+                    f_score = new_g + h[nb] if h is not None else new_g
+                    heapq.heappush(heap, (f_score, new_g, nb))
+        else:
+            # Hết hàng đợi: goal không tới được, giữ ô gần nhất
+            self.finished = True
+        self.best = best
+
+    def direction(self, map_data, start, goal, cost_field):
+        graph = get_grid(map_data)
+        start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+        if start_id < 0 or goal_id < 0 or start_id == goal_id:
+            self.finished = True
+            self.last_expanded = 0
+            return None
+        if (
+            graph is not self.graph
+            or start_id != self.start_id
+            or goal_id != self.goal_id
+            or (self.finished and cost_field is not self.field)
+        ):
+            h = None
+            if self.use_heuristic:
+                h = get_landmarks(map_data).heuristic_to(goal_id)
+            self.reset(graph, start_id, goal_id, cost_field, h)
+        expanded = self.expanded
+        if not self.finished:
+            # Lượt tìm đang dở vẫn dùng chi phí lúc bắt đầu cho nhất quán
+            self._search(time.perf_counter() + self.budget_ms / 1000)
+        self.last_expanded = self.expanded - expanded
+
+        node = self.best
+        parent = self.parent
+        if node == start_id:
+            return None
+        while parent[node] != start_id:
+            node = parent[node]
+        return (
+            graph.xs[node] - graph.xs[start_id],
+            graph.ys[node] - graph.ys[start_id],
+        )
@@ -0,0 +1,140 @@
+import threading
+from path_cache import path_cache
+from planners import registry
+
+# Map từ cỡ này trở lên (số ô đi được) thì Pacman tự lập kế hoạch ở luồng nền
+ASYNC_MIN_CELLS = 2048
+
+_worker = None
+
+
+class PlanWorker:
+    # Một luồng nền dùng chung, chỉ giữ yêu cầu mới nhất: yêu cầu cũ chưa kịp
+    # chạy bị thay luôn vì kết quả của nó chắc chắn đã lỗi thời. Tìm kiếm
+    # anytime chưa xong trong ngân sách một lần gọi được xếp lại hàng đợi để
+    # tinh chỉnh tiếp, mỗi lượt giao kết quả tốt hơn, tới khi xong hoặc có
+    # yêu cầu mới hơn
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.job = None
+        self.running = True
+        self.thread = threading.Thread(
+            target=self._run, name="pacman-planner", daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, handoff, tick, name, state, request):
+        with self.condition:
+            self.job = (handoff, tick, name, state, request)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.job = None
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.job is None and self.running:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                handoff, tick, name, state, request = self.job
+                self.job = None
+            try:
+                move = registry.call(name, state, request)
+            except Exception as e:
+                print(f"Background planner {name} failed: {e}")
+                move = None
+            handoff.deliver(tick, request, move)
+            if (
+                registry.has(name, "anytime")
+                and not state.finished
+                and tick == handoff.tick
+            ):
+                with self.condition:
+                    if self.job is None and self.running:
+                        self.job = (handoff, tick, name, state, request)
+                        handoff.requeued += 1
+
+
+def get_worker():
+    global _worker
+    if _worker is None:
+        _worker = PlanWorker()
+    return _worker
+
+
+def shutdown_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+    _worker = None
+
+
+class AsyncPlan:
+    # Chỗ trao kết quả giữa luồng nền và một Pacman. Mỗi lần gửi đánh số tick
+    # tăng dần; kết quả chỉ được dùng nếu là của lần gửi mới nhất
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tick = 0
+        self.result = None
+        self.submitted = 0
+        self.applied = 0
+        self.dropped = 0
+        self.requeued = 0
+        self.map_key = None
+        self.map_snapshot = None
+
+    def snapshot(self, map_data):
+        # path_cache.version tăng mỗi khi ăn pellet hoặc đổi map nên giữa hai
+        # lần ăn dùng lại được bản chụp cũ
+        key = (id(map_data), path_cache.version)
+        if key != self.map_key:
+            self.map_key = key
+            self.map_snapshot = snapshot_map(map_data)
+        return self.map_snapshot
+
+    def submit(self, name, state, request):
+        # request phải bất biến (map dạng tuple chuỗi, vị trí dạng tuple) vì
+        # vòng lặp game tiếp tục sửa map trong lúc luồng nền đọc
+        self.tick += 1
+        self.submitted += 1
+        get_worker().submit(self, self.tick, name, state, request)
+
+    def deliver(self, tick, request, move):
+        with self.lock:
+            self.result = (tick, request, move)
+
+    def poll(self, start):
+        # Trả về (request, move) khi Pacman đã tới ô start của lần gửi mới
+        # nhất; kết quả của lần gửi cũ bị bỏ, kết quả cho ô chưa tới thì giữ
+        with self.lock:
+            result = self.result
+            if result is None:
+                return None
+            tick, request, move = result
+            if tick == self.tick and request.start != start:
+                return None
+            self.result = None
+        if tick != self.tick:
+            self.dropped += 1
+            return None
+        self.applied += 1
+        return request, move
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "applied": self.applied,
+            "dropped": self.dropped,
+            "requeued": self.requeued,
+        }
+
+
+def snapshot_map(map_data):
+    # Bản chụp bất biến: các planner chỉ đọc map_data[y][x] và len() nên
+    # tuple các chuỗi dùng thay list các list được
+    return tuple("".join(row) for row in map_data)
@@ -0,0 +1,101 @@
+INF = float("inf")
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+class Bitboard:
+    # Mỗi ô là một bit của số nguyên Python (bit y * width + x). Thêm một cột
+    # đệm luôn bằng 0 để dịch trái/phải không tràn sang hàng kế tiếp
+    def __init__(self, map_data):
+        self.rows, self.cols = len(map_data), len(map_data[0])
+        self.width = self.cols + 1
+        self.text = "\n".join(
+            "".join(row[: self.cols]).ljust(self.cols, "#") for row in map_data
+        )
+        self.open = self._mask("#", invert=True)
+        self.pellets = self._mask(".")
+        self.power = self._mask("o")
+
+    def _mask(self, chars, invert=False):
+        # Đảo chuỗi map để ký tự đầu tiên thành bit thấp nhất rồi để int()
+        # đọc cả map một lần; "\n" cuối mỗi hàng chính là cột đệm
+        table = {
+            ord(ch): "1" if (ch in chars) != invert else "0"
+            for ch in set(self.text)
+        }
+        table[ord("\n")] = "0"
+        bits = self.text[::-1].translate(table)
+        return int(bits, 2) if bits else 0
+
+    def bit(self, pos):
+        x, y = int(pos[0]), int(pos[1])
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return 1 << (y * self.width + x)
+        return 0
+
+    def expand(self, frontier):
+        w = self.width
+        return (
+            (frontier << 1)
+            | (frontier >> 1)
+            | (frontier << w)
+            | (frontier >> w)
+        ) & self.open
+
+    def layers(self, start, limit=None):
+        # Lần lượt trả về tập ô ở khoảng cách 0, 1, 2, ... tính từ start
+        frontier = self.bit(start)
+        visited = frontier
+        depth = 0
+        while frontier and (limit is None or depth <= limit):
+            yield frontier
+            frontier = self.expand(frontier) & ~visited
+            visited |= frontier
+            depth += 1
+
+    def distance(self, start, goal):
+        target = self.bit(goal) & self.open
+        if not target:
+            return INF
+        for depth, frontier in enumerate(self.layers(start)):
+            if frontier & target:
+                return depth
+        return INF
+
+    def reachable(self, start):
+        visited = 0
+        for frontier in self.layers(start):
+            visited |= frontier
+        return visited
+
+    def first_open(self):
+        if not self.open:
+            return None
+        index = (self.open & -self.open).bit_length() - 1
+        return (index % self.width, index // self.width)
+
+    def is_connected(self):
+        start = self.first_open()
+        return start is None or self.reachable(start) == self.open
+
+    def eat(self, pos):
+        bit = self.bit(pos)
+        self.pellets &= ~bit
+        self.power &= ~bit
+
+    def pellets_left(self):
+        return popcount(self.pellets | self.power)
+
+
+_last_map = None
+_last_board = None
+
+
+def get_board(map_data):
+    # Theo dõi pellet nên gắn với chính đối tượng map, không theo bố cục tường
+    global _last_map, _last_board
+    if map_data is not _last_map:
+        _last_map, _last_board = map_data, Bitboard(map_data)
+    return _last_board
@@ -0,0 +1,127 @@
+import heapq
+import numpy as np
+from algorithms import get_grid
+
+INF = float("inf")
+
+
+class DStarLite:
+    # Tìm ngược từ goal về Pacman và giữ cây tìm kiếm giữa các frame: khi
+    # Pacman di chuyển hoặc chi phí quanh ghost đổi chỉ sửa các ô bị ảnh hưởng
+    def __init__(self):
+        self.graph = None
+        self.goal_id = -1
+        self.start_id = -1
+        self.field = None
+        self.step_cost = None
+        self.expanded = 0
+
+    def reset(self, graph, start_id, goal_id, cost_field):
+        n = graph.size
+        self.graph = graph
+        self.g = [INF] * n
+        self.rhs = [INF] * n
+        self.open_key = [None] * n
+        self.open_heap = []
+        self.km = 0
+        self.start_id = start_id
+        self.goal_id = goal_id
+        self.field = cost_field
+        self.step_cost = graph.step_costs(cost_field)
+        self.rhs[goal_id] = 0
+        self._push(goal_id, self._key(goal_id))
+
+    def _h(self, a, b):
+        xs, ys = self.graph.xs, self.graph.ys
+        return abs(xs[a] - xs[b]) + abs(ys[a] - ys[b])
+
+    def _key(self, u):
+        m = min(self.g[u], self.rhs[u])
+        return (m + self._h(self.start_id, u) + self.km, m)
+
+    def _push(self, u, key):
+        self.open_key[u] = key
+        heapq.heappush(self.open_heap, (key[0], key[1], u))
+
+    def _update_vertex(self, u):
+        g, rhs, step = self.g, self.rhs, self.step_cost
+        if u != self.goal_id:
+            rhs[u] = min(
+                (step[s] + g[s] for s in self.graph.neighbors[u]), default=INF
+            )
+        if g[u] != rhs[u]:
+            self._push(u, self._key(u))
+        else:
+            self.open_key[u] = None
+
+    def _top(self):
+        heap, open_key = self.open_heap, self.open_key
+        while heap and open_key[heap[0][2]] != heap[0][:2]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _compute_shortest_path(self):
+        g, rhs, neighbors = self.g, self.rhs, self.graph.neighbors
+        start = self.start_id
+        while True:
+            top = self._top()
+            if top is None:
+                break
+            if top[:2] >= self._key(start) and rhs[start] == g[start]:
+                break
+            k1, k2, u = heapq.heappop(self.open_heap)
+            self.open_key[u] = None
+            new_key = self._key(u)
+            if (k1, k2) < new_key:
+                self._push(u, new_key)
+                continue
+            self.expanded += 1
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+                for s in neighbors[u]:
+                    self._update_vertex(s)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for s in neighbors[u]:
+                    self._update_vertex(s)
+
+    def _apply_cost_changes(self, cost_field):
+        if cost_field is self.field:
+            return
+        changed = np.flatnonzero(cost_field != self.field).tolist()
+        self.field = cost_field
+        if not changed:
+            return
+        self.step_cost = self.graph.step_costs(cost_field)
+        # Chi phí bước vào ô v đổi => các cạnh u -> v đổi, cập nhật mọi u kề v
+        neighbors = self.graph.neighbors
+        for v in changed:
+            for u in neighbors[v]:
+                self._update_vertex(u)
+
+    def direction(self, map_data, start, goal, cost_field):
+        graph = get_grid(map_data)
+        start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+        self.expanded = 0
+        if start_id < 0 or goal_id < 0 or start_id == goal_id:
+            return None
+
+        if graph is not self.graph or goal_id != self.goal_id:
+            # Đổi map hoặc đổi mục tiêu (pellet bị ăn) thì dựng lại cây
+            self.reset(graph, start_id, goal_id, cost_field)
+        else:
+            if start_id != self.start_id:
+                self.km += self._h(self.start_id, start_id)
+                self.start_id = start_id
+            self._apply_cost_changes(cost_field)
+        self._compute_shortest_path()
+
+        g, step = self.g, self.step_cost
+        if g[start_id] == INF:
+            return None
+        best = min(graph.neighbors[start_id], key=lambda v: step[v] + g[v])
+        return (
+            graph.xs[best] - graph.xs[start_id],
+            graph.ys[best] - graph.ys[start_id],
+        )
@@ -2,6 +2,9 @@ import pygame
 import os
 import random
 import algorithms as alg
+from path_cache import path_cache
+from scheduler import DecisionScheduler
+from sprite_loader import load_sprite
 
 TILE_SIZE = 20
 
@@ -29,83 +32,67 @@ class Ghost:
         self.chase_path = pygame.Vector2(0, 0)
         self.chase_path_prev = pygame.Vector2(0, 0)
         self.bfs_index = 0
+        self.scheduler = DecisionScheduler()
 
         self.name = name.capitalize()
         self.sprite_folder = sprite_folder
         self.sprite_eyes = sprite_eyes
         self.FRIGHTENED_SPRITES = {
             "blue": [
-                pygame.transform.scale(
-                    pygame.image.load(
-                        os.path.join(sprite_frightened, "blue1.png")
-                    ).convert_alpha(),
+                load_sprite(
+                    os.path.join(sprite_frightened, "blue1.png"),
                     (TILE_SIZE, TILE_SIZE),
                 ),
-                pygame.transform.scale(
-                    pygame.image.load(
-                        os.path.join(sprite_frightened, "blue2.png")
-                    ).convert_alpha(),
+                load_sprite(
+                    os.path.join(sprite_frightened, "blue2.png"),
                     (TILE_SIZE, TILE_SIZE),
                 ),
             ],
             "white": [
-                pygame.transform.scale(
-                    pygame.image.load(
-                        os.path.join(sprite_frightened, "white1.png")
-                    ).convert_alpha(),
+                load_sprite(
+                    os.path.join(sprite_frightened, "white1.png"),
                     (TILE_SIZE, TILE_SIZE),
                 ),
-                pygame.transform.scale(
-                    pygame.image.load(
-                        os.path.join(sprite_frightened, "white2.png")
-                    ).convert_alpha(),
+                load_sprite(
+                    os.path.join(sprite_frightened, "white2.png"),
                     (TILE_SIZE, TILE_SIZE),
                 ),
             ],
         }
         self.frames = [
-            pygame.transform.scale(
-                pygame.image.load(
-                    os.path.join(sprite_folder, f"{self.name}1.png")
-                ).convert_alpha(),
+            load_sprite(
+                os.path.join(sprite_folder, f"{self.name}1.png"),
                 (TILE_SIZE, TILE_SIZE),
             ),
-            pygame.transform.scale(
-                pygame.image.load(
-                    os.path.join(sprite_folder, f"{self.name}2.png")
-                ).convert_alpha(),
+            load_sprite(
+                os.path.join(sprite_folder, f"{self.name}2.png"),
                 (TILE_SIZE, TILE_SIZE),
             ),
         ]
 
         self.health_frames = [
-            pygame.transform.scale(
-                pygame.image.load(
-                    os.path.join(sprite_health, "heal1.png")
-                ).convert_alpha(),
-                (TILE_SIZE, TILE_SIZE),
+            load_sprite(
+                os.path.join(sprite_health, "heal1.png"), (TILE_SIZE, TILE_SIZE)
             ),
-            pygame.transform.scale(
-                pygame.image.load(
-                    os.path.join(sprite_health, "heal2.png")
-                ).convert_alpha(),
-                (TILE_SIZE, TILE_SIZE),
+            load_sprite(
+                os.path.join(sprite_health, "heal2.png"), (TILE_SIZE, TILE_SIZE)
             ),
         ]
 
         self.eyes = {
-            (1, 0): pygame.image.load(
-                os.path.join(sprite_eyes, "eyeRight.png")
-            ).convert_alpha(),
-            (-1, 0): pygame.image.load(
-                os.path.join(sprite_eyes, "eyeLeft.png")
-            ).convert_alpha(),
-            (0, -1): pygame.image.load(
-                os.path.join(sprite_eyes, "eyeUp.png")
-            ).convert_alpha(),
-            (0, 1): pygame.image.load(
-                os.path.join(sprite_eyes, "eyeDown.png")
-            ).convert_alpha(),
+            (1, 0): load_sprite(
+                os.path.join(sprite_eyes, "eyeRight.png"),
+                (TILE_SIZE, TILE_SIZE),
+            ),
+            (-1, 0): load_sprite(
+                os.path.join(sprite_eyes, "eyeLeft.png"), (TILE_SIZE, TILE_SIZE)
+            ),
+            (0, -1): load_sprite(
+                os.path.join(sprite_eyes, "eyeUp.png"), (TILE_SIZE, TILE_SIZE)
+            ),
+            (0, 1): load_sprite(
+                os.path.join(sprite_eyes, "eyeDown.png"), (TILE_SIZE, TILE_SIZE)
+            ),
         }
 
         self.current_frame = 0
@@ -183,13 +170,20 @@ class Ghost:
                 self.change_direction(map_data)
             return
 
-        if chase_mode and random.random() > 0.4:
-            move = alg.bfs_direction(
-                map_data,
-                (int(self.grid_pos.x), int(self.grid_pos.y)),
-                (int(pacman.grid_pos.x), int(pacman.grid_pos.y)),
-            )
-            self.chase_path = pygame.Vector2(move[0], move[1])
+        tile = (int(self.grid_pos.x), int(self.grid_pos.y))
+        pacman_tile = (int(pacman.grid_pos.x), int(pacman.grid_pos.y))
+        # Pacman ở sát bên thì mỗi lần Pacman sang ô mới cũng là một sự kiện
+        close = abs(tile[0] - pacman_tile[0]) + abs(tile[1] - pacman_tile[1])
+        events = (chase_mode, pacman_tile if close <= 2 else None)
+        if self.scheduler.due(self.pixel_pos, tile, events):
+            # Chỉ hướng đuổi được tính lại theo quyết định (tâm ô / sự kiện)
+            self.scheduler.commit(self.pixel_pos, tile, events, chase_mode)
+            if chase_mode:
+                move = alg.flow_direction(map_data, tile, pacman_tile)
+                self.chase_path = pygame.Vector2(move[0], move[1])
+
+        # Bốc thăm đuổi 60% / đi lang thang 40% mỗi frame như trước
+        if self.scheduler.decision and random.random() > 0.4:
             if self.chase_path == pygame.Vector2(0, 0):
                 directions = [
                     pygame.Vector2(1, 0),
@@ -315,19 +309,20 @@ class Ghost:
 
             key = (int(self.direction.x), int(self.direction.y))
             if key in self.eyes:
-                eye = pygame.transform.scale(
-                    self.eyes[key], (TILE_SIZE, TILE_SIZE)
-                )
-                screen.blit(eye, self.pixel_pos)
+                screen.blit(self.eyes[key], self.pixel_pos)
 
     def set_frightened(self, duration_frames=420):
         self.frightened_timer = duration_frames
+        self.scheduler.reset()
         self.frightened_anim_frame = 0
         self.frightened_anim_counter = 0
 
     def set_alive(self, map_data, start_pos, goal_pos):
         self.alive = False
-        self.bfs_path = alg.bfs_shortest_path(
+        self.scheduler.reset()
+        self.bfs_path = path_cache.call(
+            "bfs_shortest_path",
+            alg.bfs_shortest_path,
             map_data,
             (int(start_pos.x), int(start_pos.y)),
             (int(goal_pos.x), int(goal_pos.y)),
@@ -0,0 +1,234 @@
+import heapq
+import random
+import numpy as np
+from algorithms import get_grid, danger_field
+from landmarks import get_landmarks
+
+CLUSTER_SIZE = 16
+INF = float("inf")
+
+
+class HierarchicalGraph:
+    # HPA*: chia lưới thành cụm CLUSTER_SIZE x CLUSTER_SIZE, nút trừu tượng là
+    # các cửa giữa hai cụm kề nhau, cạnh trong cụm tính sẵn bằng Dijkstra
+    def __init__(self, graph, landmarks, cluster_size=CLUSTER_SIZE):
+        self.graph = graph
+        self.landmarks = landmarks
+        self.cluster_size = cluster_size
+        self.cluster_cols = (graph.cols + cluster_size - 1) // cluster_size
+        self.cluster_of = [
+            (y // cluster_size) * self.cluster_cols + x // cluster_size
+            for x, y in graph.cells
+        ]
+        self.static_cost = (graph.dead_end_cost + 1).tolist()
+        self.nodes = []
+        self.node_of_cell = {}
+        self.cluster_nodes = {}
+        self.adj = []
+
+        for cid in range(graph.size):
+            x, y = graph.cells[cid]
+            # Chỉ xét biên phải và biên dưới của mỗi cụm để không trùng cửa
+            if (x + 1) % cluster_size == 0:
+                self._scan_border(cid, (1, 0), (0, 1))
+            if (y + 1) % cluster_size == 0:
+                self._scan_border(cid, (0, 1), (1, 0))
+        for cluster, nodes in self.cluster_nodes.items():
+            for node in nodes:
+                dist, _ = self._dijkstra_in_cluster(
+                    self.nodes[node], cluster, self.static_cost
+                )
+                for other in nodes:
+                    cell = self.nodes[other]
+                    if other != node and cell in dist:
+                        self.adj[node].append((other, dist[cell]))
+        self.node_cells = np.array(self.nodes, dtype=np.int64)
+
+    def _node(self, cid):
+        node = self.node_of_cell.get(cid)
+        if node is None:
+            node = self.node_of_cell[cid] = len(self.nodes)
+            self.nodes.append(cid)
+            self.adj.append([])
+            self.cluster_nodes.setdefault(self.cluster_of[cid], []).append(node)
+        return node
+
+    def _scan_border(self, cid, across, along):
+        # Tìm đoạn cửa liên tục bắt đầu tại cid dọc theo biên cụm;
+        # đoạn ngắn lấy một cửa ở giữa, đoạn dài lấy hai cửa ở hai đầu
+        graph = self.graph
+        if not self._is_door(cid, across):
+            return
+        x, y = graph.cells[cid]
+        prev = graph.cell_id((x - along[0], y - along[1]))
+        if (
+            prev >= 0
+            and self.cluster_of[prev] == self.cluster_of[cid]
+            and self._is_door(prev, across)
+        ):
+            return
+        run = [cid]
+        while True:
+            cx, cy = graph.cells[run[-1]]
+            nxt = graph.cell_id((cx + along[0], cy + along[1]))
+            if (
+                nxt < 0
+                or self.cluster_of[nxt] != self.cluster_of[cid]
+                or not self._is_door(nxt, across)
+            ):
+                break
+            run.append(nxt)
+        picks = [run[len(run) // 2]] if len(run) < 6 else [run[0], run[-1]]
+        for inside in picks:
+            ix, iy = graph.cells[inside]
+            outside = graph.cell_id((ix + across[0], iy + across[1]))
+            a, b = self._node(inside), self._node(outside)
+            self.adj[a].append((b, self.static_cost[outside]))
+            self.adj[b].append((a, self.static_cost[inside]))
+
+    def _is_door(self, cid, across):
+        x, y = self.graph.cells[cid]
+        other = self.graph.cell_id((x + across[0], y + across[1]))
+        return other >= 0 and self.cluster_of[other] != self.cluster_of[cid]
+
+    def _dijkstra_in_cluster(self, source, cluster, step, reverse=False):
+        # reverse=True: chi phí từ mỗi ô tới source (cạnh u -> v tốn step[v])
+        cluster_of, neighbors = self.cluster_of, self.graph.neighbors
+        dist = {source: 0}
+        parent = {source: -1}
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v in neighbors[u]:
+                if cluster_of[v] != cluster:
+                    continue
+                nd = d + (step[u] if reverse else step[v])
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    parent[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return dist, parent
+
+    def direction(self, start, goal, step_cost):
+        graph = self.graph
+        start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+        self.expanded = 0
+        if start_id < 0 or goal_id < 0 or start_id == goal_id:
+            return None
+        start_cluster = self.cluster_of[start_id]
+        goal_cluster = self.cluster_of[goal_id]
+        xs, ys = graph.xs, graph.ys
+        # Heuristic ALT cho mọi nút trừu tượng, tính một lần mỗi truy vấn
+        node_h = self.landmarks.heuristic_for(self.node_cells, goal_id).tolist()
+
+        # Đoạn đầu trong cụm của Pacman dùng chi phí động (có ghost),
+        # đoạn cuối trong cụm của goal dùng chi phí tĩnh như cạnh tính sẵn
+        from_start, parent = self._dijkstra_in_cluster(
+            start_id, start_cluster, step_cost
+        )
+        to_goal, _ = self._dijkstra_in_cluster(
+            goal_id, goal_cluster, self.static_cost, reverse=True
+        )
+
+        goal_node = len(self.nodes)
+        best = {}
+        first = {}
+        heap = []
+
+        def relax(node, cost, first_cell):
+            if cost < best.get(node, INF):
+                best[node] = cost
+                first[node] = first_cell
+                h = 0 if node == goal_node else node_h[node]
+                heapq.heappush(heap, (cost + h, cost, node))
+
+        if start_cluster == goal_cluster and goal_id in from_start:
+            relax(goal_node, from_start[goal_id], goal_id)
+        for node in self.cluster_nodes.get(start_cluster, ()):
+            cell = self.nodes[node]
+            if cell in from_start:
+                relax(
+                    node, from_start[cell], None if cell == start_id else cell
+                )
+
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if cost > best[node]:
+                continue
+            if node == goal_node:
+                break
+            self.expanded += 1
+            cell = self.nodes[node]
+            first_cell = first[node]
+            if first_cell is not None and cell in to_goal:
+                relax(goal_node, cost + to_goal[cell], first_cell)
+            for other, edge_cost in self.adj[node]:
+                other_cell = self.nodes[other]
+                if self.cluster_of[other_cell] == start_cluster and (
+                    self.cluster_of[cell] == start_cluster
+                ):
+                    # Trong cụm đầu đã có chi phí chính xác từ from_start
+                    continue
+                relax(
+                    other,
+                    cost + edge_cost,
+                    other_cell if first_cell is None else first_cell,
+                )
+
+        if goal_node not in best:
+            return None
+        # Chỉ tinh chỉnh đoạn đầu: lần ngược trong cụm xuất phát tới bước đầu
+        cell = first[goal_node]
+        while cell in parent and parent[cell] != start_id:
+            cell = parent[cell]
+        return (xs[cell] - xs[start_id], ys[cell] - ys[start_id])
+
+
+def get_hierarchy(map_data):
+    graph = get_grid(map_data)
+    if graph.hierarchy is None:
+        graph.hierarchy = HierarchicalGraph(graph, get_landmarks(map_data))
+    return graph.hierarchy
+
+
+if __name__ == "__main__":
+    # Đo thời gian lập kế hoạch trên mê cung 256x256 so với ngân sách 1 frame
+    import time
+    from map_generator import create_maze
+    from algorithms import a_star_search
+
+    random.seed(0)
+    map_data = create_maze(256, 256)
+    t0 = time.perf_counter()
+    graph = get_grid(map_data)
+    hierarchy = get_hierarchy(map_data)
+    print(
+        f"{graph.size} cells, {len(hierarchy.nodes)} abstract nodes, "
+        f"built in {time.perf_counter() - t0:.2f} s"
+    )
+    field = danger_field(map_data, [])
+    step = field.tolist()
+    hpa_times, grid_times = [], []
+    for _ in range(50):
+        start = random.choice(graph.cells)
+        goal = random.choice(graph.cells)
+        t0 = time.perf_counter()
+        hierarchy.direction(start, goal, step)
+        hpa_times.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        a_star_search(
+            graph,
+            graph.cell_id(start),
+            graph.cell_id(goal),
+            step,
+            graph.manhattan_to(graph.cell_id(goal)),
+            max_nodes=graph.size,
+        )
+        grid_times.append(time.perf_counter() - t0)
+    for name, times in [("hpa*", hpa_times), ("grid a*", grid_times)]:
+        print(
+            f"{name}: mean {1000 * sum(times) / len(times):.2f} ms, "
+            f"max {1000 * max(times):.2f} ms (frame budget 16.7 ms)"
+        )
@@ -0,0 +1,209 @@
+import heapq
+import numpy as np
+from algorithms import get_grid
+
+INF = float("inf")
+
+
+class JunctionGraph:
+    # Nút là ngã rẽ và ngõ cụt, cạnh là hành lang (độ dài + danh sách ô);
+    # các ô có đúng hai lối ra chỉ nằm trên cạnh, không bao giờ được mở rộng
+    def __init__(self, graph):
+        self.graph = graph
+        neighbors = graph.neighbors
+        n = graph.size
+        self.node_of_cell = [-1] * n
+        self.nodes = []
+        # edge_of_cell[c] = (cạnh, vị trí trong tiles) cho ô nằm giữa hành lang
+        self.edge_of_cell = [None] * n
+        self.edges = []
+        self.adj = []
+
+        for cid in range(n):
+            if len(neighbors[cid]) != 2:
+                self._add_node(cid)
+        walked = set()
+        for a in range(len(self.nodes)):
+            self._walk_from(a, walked)
+        # Vòng kín toàn ô hai lối ra không có nút nào: lấy một ô làm nút
+        for cid in range(n):
+            if self.node_of_cell[cid] < 0 and self.edge_of_cell[cid] is None:
+                self._walk_from(self._add_node(cid), walked)
+
+        edge_of_tile = []
+        interior = []
+        for e, (_, _, tiles) in enumerate(self.edges):
+            interior.extend(tiles[:-1])
+            edge_of_tile.extend([e] * (len(tiles) - 1))
+        self.interior = np.array(interior, dtype=np.int64)
+        self.edge_of_interior = np.array(edge_of_tile, dtype=np.int64)
+        self.edge_a = np.array([a for a, _, _ in self.edges], dtype=np.int64)
+        self.edge_b = np.array([b for _, b, _ in self.edges], dtype=np.int64)
+        self._cost_key = None
+        self._cost_value = None
+
+    def _add_node(self, cid):
+        self.node_of_cell[cid] = len(self.nodes)
+        self.nodes.append(cid)
+        self.adj.append([])
+        return len(self.nodes) - 1
+
+    def _walk_from(self, a, walked):
+        neighbors = self.graph.neighbors
+        start_cell = self.nodes[a]
+        for first in neighbors[start_cell]:
+            if (start_cell, first) in walked:
+                continue
+            prev, cur = start_cell, first
+            tiles = [cur]
+            while self.node_of_cell[cur] < 0:
+                nxt = [nb for nb in neighbors[cur] if nb != prev]
+                prev, cur = cur, nxt[0]
+                tiles.append(cur)
+            b = self.node_of_cell[cur]
+            walked.add((start_cell, first))
+            walked.add((cur, tiles[-2] if len(tiles) > 1 else start_cell))
+            e = len(self.edges)
+            self.edges.append((a, b, tuple(tiles)))
+            for pos, cell in enumerate(tiles[:-1]):
+                self.edge_of_cell[cell] = (e, pos)
+            self.adj[a].append((e, b, True))
+            if b != a or len(tiles) > 1:
+                self.adj[b].append((e, a, False))
+
+    def edge_costs(self, cost_field):
+        # Chi phí đi hết mỗi hành lang theo hai chiều, cộng dồn bằng NumPy
+        if cost_field is self._cost_key:
+            return self._cost_value
+        field = np.asarray(cost_field, dtype=np.float64)
+        inner = np.bincount(
+            self.edge_of_interior,
+            weights=field[self.interior],
+            minlength=len(self.edges),
+        )
+        nodes = np.array(self.nodes, dtype=np.int64)
+        forward = inner + field[nodes[self.edge_b]]
+        backward = inner + field[nodes[self.edge_a]]
+        self._cost_key = cost_field
+        self._cost_value = (forward.tolist(), backward.tolist())
+        return self._cost_value
+
+    def _exits(self, cid, step):
+        # Từ một ô bất kỳ: các nút đi tới được ngay, kèm chi phí và bước đầu
+        node = self.node_of_cell[cid]
+        if node >= 0:
+            return [(node, 0, None)]
+        e, pos = self.edge_of_cell[cid]
+        a, b, tiles = self.edges[e]
+        to_b = sum(step[t] for t in tiles[pos + 1 :])
+        to_a = sum(step[t] for t in tiles[:pos]) + step[self.nodes[a]]
+        back = tiles[pos - 1] if pos > 0 else self.nodes[a]
+        return [(b, to_b, tiles[pos + 1]), (a, to_a, back)]
+
+    def _entries(self, cid, step):
+        # Các nút mà từ đó đi vào được goal, kèm chi phí đoạn cuối và ô đầu
+        node = self.node_of_cell[cid]
+        if node >= 0:
+            return {node: [(0, None)]}
+        e, pos = self.edge_of_cell[cid]
+        a, b, tiles = self.edges[e]
+        entries = {a: [(sum(step[t] for t in tiles[: pos + 1]), tiles[0])]}
+        entries.setdefault(b, []).append(
+            (sum(step[t] for t in tiles[pos:-1]), tiles[-2])
+        )
+        return entries
+
+    def search(self, start, goal, step, edge_costs, use_heuristic=True):
+        graph = self.graph
+        start_id, goal_id = graph.cell_id(start), graph.cell_id(goal)
+        self.expanded = 0
+        if start_id < 0 or goal_id < 0 or start_id == goal_id:
+            return None
+        forward, backward = edge_costs
+        xs, ys = graph.xs, graph.ys
+        gx, gy = xs[goal_id], ys[goal_id]
+
+        def h(cid):
+            if not use_heuristic:
+                return 0
+            return abs(xs[cid] - gx) + abs(ys[cid] - gy)
+
+        goal_node = len(self.nodes)
+        entries = self._entries(goal_id, step)
+        best = {}
+        first = {}
+        heap = []
+
+        def relax(node, cost, step_cell):
+            if cost < best.get(node, INF):
+                best[node] = cost
+                first[node] = step_cell
+                cell = goal_id if node == goal_node else self.nodes[node]
+                heapq.heappush(heap, (cost + h(cell), cost, node))
+
+        # Start và goal cùng nằm giữa một hành lang: đi thẳng không qua nút
+        if (
+            self.edge_of_cell[start_id] is not None
+            and self.edge_of_cell[goal_id] is not None
+        ):
+            e, i = self.edge_of_cell[start_id]
+            e2, j = self.edge_of_cell[goal_id]
+            if e == e2:
+                tiles = self.edges[e][2]
+                if j > i:
+                    relax(
+                        goal_node,
+                        sum(step[t] for t in tiles[i + 1 : j + 1]),
+                        tiles[i + 1],
+                    )
+                else:
+                    relax(
+                        goal_node,
+                        sum(step[t] for t in tiles[j:i]),
+                        tiles[i - 1],
+                    )
+
+        for node, cost, step_cell in self._exits(start_id, step):
+            relax(node, cost, step_cell)
+
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if cost > best[node]:
+                continue
+            if node == goal_node:
+                break
+            self.expanded += 1
+            step_cell = first[node]
+            for tail_cost, tail_first in entries.get(node, ()):
+                relax(
+                    goal_node,
+                    cost + tail_cost,
+                    tail_first if step_cell is None else step_cell,
+                )
+            for e, other, is_forward in self.adj[node]:
+                edge_cost = forward[e] if is_forward else backward[e]
+                if step_cell is None:
+                    tiles = self.edges[e][2]
+                    nxt = (
+                        tiles[0]
+                        if is_forward
+                        else (
+                            tiles[-2] if len(tiles) > 1 else self.nodes[other]
+                        )
+                    )
+                else:
+                    nxt = step_cell
+                relax(other, cost + edge_cost, nxt)
+
+        if goal_node not in best or best[goal_node] == INF:
+            return None
+        cell = first[goal_node]
+        return (xs[cell] - xs[start_id], ys[cell] - ys[start_id])
+
+
+def get_junction_graph(map_data):
+    graph = get_grid(map_data)
+    if graph.junctions is None:
+        graph.junctions = JunctionGraph(graph)
+    return graph.junctions
+
@@ -0,0 +1,120 @@
+import heapq
+import random
+import numpy as np
+from algorithms import get_grid, danger_field, a_star_search
+
+NUM_LANDMARKS = 8
+FAR = 1 << 30
+
+
+def static_distances(graph, source_id, step_cost):
+    # Dijkstra theo chi phí tĩnh (1 + phạt ngõ cụt): cận dưới của danger field
+    dist = [FAR] * graph.size
+    dist[source_id] = 0
+    heap = [(0, source_id)]
+    neighbors = graph.neighbors
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for v in neighbors[u]:
+            nd = d + step_cost[v]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return np.array(dist, dtype=np.int64)
+
+
+class Landmarks:
+    # Heuristic ALT: lưu khoảng cách từ vài landmark (O(k * số ô) bộ nhớ)
+    # và lấy cận dưới từ bất đẳng thức tam giác
+    def __init__(self, graph, count=NUM_LANDMARKS):
+        self.graph = graph
+        self.ids = []
+        self.static_cost = graph.dead_end_cost + 1
+        step = self.static_cost.tolist()
+        rows = []
+        if graph.size:
+            # Chọn landmark xa nhất so với các landmark đã có
+            nearest = static_distances(graph, 0, step)
+            nearest[nearest >= FAR] = -1
+            candidate = int(np.argmax(nearest))
+            nearest = np.full(graph.size, FAR, dtype=np.int64)
+            for _ in range(min(count, graph.size)):
+                self.ids.append(candidate)
+                dist = static_distances(graph, candidate, step)
+                rows.append(dist)
+                nearest = np.minimum(nearest, dist)
+                candidate = int(np.argmax(nearest))
+                if nearest[candidate] == 0:
+                    break
+        self.dist = (
+            np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.int64)
+        )
+        self._goal_id = -1
+        self._h = None
+
+    def heuristic_to(self, goal_id):
+        if goal_id == self._goal_id:
+            return self._h
+        self._goal_id = goal_id
+        self._h = self.heuristic_for(slice(None), goal_id).tolist()
+        return self._h
+
+    def heuristic_for(self, cells, goal_id):
+        # cells: mảng id ô (hoặc slice) cần heuristic tới goal_id
+        graph = self.graph
+        manhattan = np.abs(graph.np_xs[cells] - graph.xs[goal_id]) + np.abs(
+            graph.np_ys[cells] - graph.ys[goal_id]
+        )
+        if not len(self.ids):
+            return manhattan
+        # Chi phí tính khi bước vào ô nên d(v, L) = d(L, v) + s(L) - s(v):
+        # cận d(L, t) - d(L, v) và d(v, L) - d(t, L)
+        dist = self.dist[:, cells]
+        to_goal = self.dist[:, goal_id : goal_id + 1]
+        s = self.static_cost
+        alt = np.maximum(to_goal - dist, dist - to_goal + s[goal_id] - s[cells])
+        return np.maximum(alt.max(axis=0), manhattan)
+
+
+def get_landmarks(map_data):
+    graph = get_grid(map_data)
+    if graph.landmarks is None:
+        graph.landmarks = Landmarks(graph)
+    return graph.landmarks
+
+
+if __name__ == "__main__":
+    # So sánh số nút A* mở rộng: Manhattan và ALT, cùng truy vấn ngẫu nhiên
+    from map_loader import load_map
+    from map_generator import create_map
+
+    random.seed(0)
+    maps = [
+        (f"level{i}", load_map(f"../assets/maps/level{i}.txt"))
+        for i in range(1, 7)
+    ]
+    maps.append(("random", create_map()))
+    for name, map_data in maps:
+        graph = get_grid(map_data)
+        landmarks = get_landmarks(map_data)
+        field = danger_field(map_data, []).tolist()
+        totals = [0, 0]
+        for _ in range(200):
+            start_id = random.randrange(graph.size)
+            goal_id = random.randrange(graph.size)
+            if start_id == goal_id:
+                continue
+            a_star_search(
+                graph, start_id, goal_id, field, graph.manhattan_to(goal_id)
+            )
+            totals[0] += graph.expanded
+            a_star_search(
+                graph, start_id, goal_id, field, landmarks.heuristic_to(goal_id)
+            )
+            totals[1] += graph.expanded
+        print(
+            f"{name}: {graph.size} cells, manhattan {totals[0]} nodes, "
+            f"alt {totals[1]} nodes ({totals[1] / max(totals[0], 1):.0%})"
+        )
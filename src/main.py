@@ -5,6 +5,20 @@ from map_generrate_easy import create_map_easy
 from ghost import Ghost
 from pacman import Pacman
 from map_loader import load_map, find_pacman_start, find_ghost_start
+from algorithms import get_distance_table, get_grid
+from junction_graph import get_junction_graph
+from landmarks import get_landmarks
+from path_cache import path_cache
+from bitboard import get_board
+from mcts import shutdown_pool
+from planners import registry
+from async_planner import ASYNC_MIN_CELLS, shutdown_worker
+from pellet_index import get_pellet_index
+from map_info import get_map_info
+from map_layers import get_map_layers
+from renderer import Renderer
+from text_cache import text_cache
+from sprite_loader import preload_sprites
 from menu import (
     main_menu,
     pause_menu,
@@ -17,24 +31,19 @@ from menu import (
 TILE_SIZE = 20
 FPS = 60
 WHITE = (255, 255, 255)
-BLUE = (0, 0, 255)
-YELLOW = (255, 255, 0)
 ORANGE = (255, 150, 0)
+# Tìm đường của Pacman chạy ở luồng nền (phím A đổi, luôn bật trên map lớn)
+ASYNC_PLANNING = False
+# Chỉ cập nhật vùng màn hình thay đổi thay vì vẽ lại cả frame (phím D đổi)
+DIRTY_RECTS = True
+
+renderer = Renderer(DIRTY_RECTS)
 
 
 # ==== HÀM TIỆN ÍCH ====
 def draw_map(screen, map_data):
-    for y, row in enumerate(map_data):
-        for x, tile in enumerate(row):
-            rect = pygame.Rect(
-                x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE
-            )
-            if tile == "#":
-                pygame.draw.rect(screen, BLUE, rect)
-            elif tile == ".":
-                pygame.draw.circle(screen, YELLOW, rect.center, 3)
-            elif tile == "o":
-                pygame.draw.circle(screen, ORANGE, rect.center, 6)
+    # Tường và pellet đã vẽ sẵn thành hai lớp, mỗi frame chỉ blit hai lần
+    get_map_layers(map_data).draw(screen)
 
 
 def draw_ui(
@@ -47,23 +56,42 @@ def draw_ui(
     algorithm,
 ):
     now = pygame.time.get_ticks()
-    map_text = font.render(f"Map: {map_choice}", True, ORANGE)
-    algorithm_text = font.render(f"Algorithm: {algorithm}", True, ORANGE)
-    score_text = font.render(f"Score: {score}", True, WHITE)
-    lives_text = font.render(f"Lives: {lives}", True, WHITE)
-    times_text = font.render(f"Times: {(now - time)//1000} s", True, WHITE)
-    screen.blit(score_text, (10, 0))
-    screen.blit(lives_text, (160, 0))
-    screen.blit(times_text, (280, 0))
-    screen.blit(map_text, (0, 590))
-    screen.blit(algorithm_text, (210, 590))
+    # Chữ chỉ render lại khi nội dung đổi, còn lại lấy từ text_cache
+    render = text_cache.render
+    map_text = render(font, f"Map: {map_choice}", True, ORANGE)
+    algorithm_text = render(font, f"Algorithm: {algorithm}", True, ORANGE)
+    score_text = render(font, f"Score: {score}", True, WHITE)
+    lives_text = render(font, f"Lives: {lives}", True, WHITE)
+    times_text = render(font, f"Times: {(now - time)//1000} s", True, WHITE)
+    # Trả về các vùng đã vẽ để chế độ dirty rect cập nhật lại
+    return [
+        screen.blit(score_text, (10, 0)),
+        screen.blit(lives_text, (160, 0)),
+        screen.blit(times_text, (280, 0)),
+        screen.blit(map_text, (0, 590)),
+        screen.blit(algorithm_text, (210, 590)),
+    ]
 
 
 def check_win(map_data):
-    return not any("." in row or "o" in row for row in map_data)
+    return get_map_info(map_data).items_left() == 0
+
 
+def eat_tile(map_data, pos):
+    # Hook ăn pellet: xóa ô trên map rồi báo cho mọi cấu trúc theo dõi pellet
+    x, y = pos
+    tile = map_data[y][x]
+    map_data[y][x] = " "
+    get_map_info(map_data).eat(tile)
+    get_board(map_data).eat(pos)
+    get_pellet_index(map_data).remove(pos)
+    get_map_layers(map_data).eat(pos)
+    renderer.mark_tile(pos)
+    path_cache.invalidate()
+    return tile
 
-def reset_game(map_choice, mode):
+
+def reset_game(map_choice, mode, async_planning=ASYNC_PLANNING):
     if map_choice == "random":
         new_map_data = create_map()
     elif map_choice == "easy_random":
@@ -77,7 +105,18 @@ def reset_game(map_choice, mode):
             )
             new_map_data = create_map()
             map_choice = "random"
-    pacman = Pacman(*find_pacman_start(new_map_data), algorithm=mode)
+    path_cache.invalidate()
+    get_distance_table(new_map_data)
+    get_junction_graph(new_map_data)
+    get_landmarks(new_map_data)
+    get_pellet_index(new_map_data)
+    get_map_info(new_map_data)
+    pacman = Pacman(
+        *find_pacman_start(new_map_data),
+        algorithm=mode,
+        async_planning=async_planning
+        or get_grid(new_map_data).size >= ASYNC_MIN_CELLS,
+    )
     ghosts = [
         Ghost(
             *find_ghost_start(new_map_data, "B"),
@@ -112,16 +151,18 @@ def main():
 
     screen = pygame.display.set_mode((800, 600))
     pygame.display.set_caption("Pacman")
+    print(f"Preloaded {preload_sprites()} sprites")
 
     map_choice, mode = main_menu(screen)
-    if mode not in ["a_star", "bfs", "dfs", "ucs"]:
+    if mode not in registry.names():
         print(f"Invalid mode: {mode}. Defaulting to a_star.")
         mode = "a_star"
         map_choice = "level1.txt"
     print(f"Selected map: {map_choice}, mode: {mode}")
 
+    async_planning = ASYNC_PLANNING
     map_data, pacman, ghosts, score, won, map_choice, time = reset_game(
-        map_choice, mode
+        map_choice, mode, async_planning
     )
     MAP_WIDTH = len(map_data[0])
     MAP_HEIGHT = len(map_data)
@@ -135,13 +176,13 @@ def main():
     scatter_time = 5000
     chase_mode = False
     clock = pygame.time.Clock()
+    renderer.invalidate()
     running = True
     paused = False
 
     while running:
         now = pygame.time.get_ticks()
         dt = clock.tick(FPS)
-        screen.fill((0, 0, 0))
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -149,11 +190,12 @@ def main():
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     paused = not paused
+                    renderer.invalidate()
                     if paused:
                         result = pause_menu(screen, font)
                         if result == "menu":
                             map_choice, mode = main_menu(screen)
-                            if mode not in ["a_star", "bfs", "dfs", "ucs"]:
+                            if mode not in registry.names():
                                 print(
                                     f"Invalid mode: {mode}. Defaulting to a_star."
                                 )
@@ -167,7 +209,7 @@ def main():
                                 won,
                                 map_choice,
                                 time,
-                            ) = reset_game(map_choice, mode)
+                            ) = reset_game(map_choice, mode, async_planning)
                             screen = pygame.display.set_mode(
                                 (
                                     len(map_data[0]) * TILE_SIZE,
@@ -177,8 +219,17 @@ def main():
                             print(
                                 f"Reset game with map: {map_choice}, mode: {mode}"
                             )
+                elif event.key == pygame.K_a:
+                    async_planning = pacman.set_async_planning(
+                        pacman.async_plan is None
+                    )
+                    print(f"Background planning: {async_planning}")
+                elif event.key == pygame.K_d:
+                    dirty = renderer.toggle()
+                    print(f"Rendering: {'dirty rects' if dirty else 'full'}")
                 elif event.key == pygame.K_c:
                     show_controls(screen)
+                    renderer.invalidate()
                     screen.fill((0, 0, 0))
                     draw_map(screen, map_data)
                     pacman.draw(screen)
@@ -196,6 +247,7 @@ def main():
                     pygame.display.flip()
 
         if paused:
+            screen.fill((0, 0, 0))
             pygame.display.flip()
             continue
 
@@ -205,12 +257,12 @@ def main():
             if pacman.alive:
                 x, y = int(pacman.grid_pos.x), int(pacman.grid_pos.y)
                 if map_data[y][x] == ".":
-                    map_data[y][x] = " "
+                    eat_tile(map_data, (x, y))
                     score += 10
                     if check_win(map_data):
                         won = True
                 elif map_data[y][x] == "o":
-                    map_data[y][x] = " "
+                    eat_tile(map_data, (x, y))
                     score += 50
                     pacman.activate_chase_ghosts()
                     for ghost in ghosts:
@@ -227,24 +279,26 @@ def main():
                     chase_mode = True
                     last_time = now
 
-            draw_map(screen, map_data)
-            pacman.draw(screen)
-            for ghost in ghosts:
-                ghost.draw(screen)
-            draw_ui(
+            renderer.draw(
                 screen,
-                font,
-                score + pacman.eatGhost * 100,
-                pacman.lives,
-                time,
-                map_choice,
-                pacman.algorithm,
+                map_data,
+                [pacman, *ghosts],
+                lambda surface: draw_ui(
+                    surface,
+                    font,
+                    score + pacman.eatGhost * 100,
+                    pacman.lives,
+                    time,
+                    map_choice,
+                    pacman.algorithm,
+                ),
             )
 
             if won:
                 result = victory_menu(
                     screen, font, score + pacman.eatGhost * 100
                 )
+                renderer.invalidate()
                 if result == "next":
                     next_level = map_choice
                     if map_choice != "random" and map_choice.startswith(
@@ -259,7 +313,7 @@ def main():
                         except ValueError:
                             next_level = "random"
                     map_data, pacman, ghosts, score, won, map_choice, time = (
-                        reset_game(next_level, mode)
+                        reset_game(next_level, mode, async_planning)
                     )
                     screen = pygame.display.set_mode(
                         (
@@ -270,7 +324,7 @@ def main():
                     print(f"Next level: {map_choice}, mode: {mode}")
                 elif result == "menu":
                     map_choice, mode = main_menu(screen)
-                    if mode in ["a_star", "bfs", "dfs", "ucs"]:
+                    if mode in registry.names():
                         (
                             map_data,
                             pacman,
@@ -279,7 +333,7 @@ def main():
                             won,
                             map_choice,
                             time,
-                        ) = reset_game(map_choice, mode)
+                        ) = reset_game(map_choice, mode, async_planning)
                         screen = pygame.display.set_mode(
                             (
                                 len(map_data[0]) * TILE_SIZE,
@@ -293,9 +347,10 @@ def main():
                         running = False
         else:
             action = game_over_menu(screen, font, score + pacman.eatGhost * 100)
+            renderer.invalidate()
             if action == "retry":
                 map_data, pacman, ghosts, score, won, map_choice, time = (
-                    reset_game(map_choice, mode)
+                    reset_game(map_choice, mode, async_planning)
                 )
                 screen = pygame.display.set_mode(
                     (len(map_data[0]) * TILE_SIZE, len(map_data) * TILE_SIZE)
@@ -303,9 +358,9 @@ def main():
                 print(f"Retry with map: {map_choice}, mode: {mode}")
             elif action == "menu":
                 map_choice, mode = main_menu(screen)
-                if mode in ["a_star", "bfs", "dfs", "ucs"]:
+                if mode in registry.names():
                     map_data, pacman, ghosts, score, won, map_choice, time = (
-                        reset_game(map_choice, mode)
+                        reset_game(map_choice, mode, async_planning)
                     )
                     screen = pygame.display.set_mode(
                         (
@@ -317,8 +372,15 @@ def main():
                 else:
                     running = False
 
-        pygame.display.flip()
+        renderer.present()
 
+    print(f"Path cache: {path_cache.stats()}")
+    print(f"Renderer: {renderer.stats()}")
+    print(f"Text cache: {text_cache.stats()}")
+    for name, stats in registry.stats().items():
+        print(f"Planner {name}: {stats}")
+    shutdown_pool()
+    shutdown_worker()
     pygame.quit()
     sys.exit()
 
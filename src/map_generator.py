@@ -1,5 +1,5 @@
 import random
-from collections import deque
+from bitboard import Bitboard, popcount
 
 ROWS, COLS = 31, 28
 WALL_RATIO = 0.3
@@ -17,23 +17,12 @@ def neighbors(r, c):
 
 
 def bfs_check_connectivity(grid):
-    visited = [[False] * COLS for _ in range(ROWS)]
-    start = None
-
-    # Tìm ô đầu tiên không phải tường
-    for r in range(ROWS):
-        for c in range(COLS):
-            if grid[r][c] != "#":
-                start = (r, c)
-                break
-        if start:
-            break
+    board = Bitboard(grid)
+    # Ô đầu tiên không phải tường
+    start = board.first_open()
     if not start:
         return False
 
-    q = deque([start])
-    visited[start[0]][start[1]] = True
-    count = 1
     total_free = sum(
         row.count(".")
         + row.count("o")
@@ -45,15 +34,8 @@ def bfs_check_connectivity(grid):
         for row in grid
     )
 
-    while q:
-        r, c = q.popleft()
-        for nr, nc in neighbors(r, c):
-            if not visited[nr][nc] and grid[nr][nc] != "#":
-                visited[nr][nc] = True
-                q.append((nr, nc))
-                count += 1
-
-    return count == total_free
+    # Loang theo từng lớp bằng phép dịch bit thay vì hàng đợi từng ô
+    return popcount(board.reachable(start)) == total_free
 
 
 def has_dead_end(grid):
@@ -120,6 +102,59 @@ def create_map():
     return grid
 
 
+def create_maze(rows=ROWS, cols=COLS, loop_ratio=0.15):
+    # Mê cung lớn sinh nhanh (backtracker + đục thêm tường để tạo vòng),
+    # dùng cho map lớn hơn 31x28 mà create_map không kịp kiểm tra từng tường
+    grid = [["#" for _ in range(cols)] for _ in range(rows)]
+    start = (1, 1)
+    grid[1][1] = "."
+    stack = [start]
+    while stack:
+        r, c = stack[-1]
+        options = [
+            (r + dr, c + dc, r + dr // 2, c + dc // 2)
+            for dr, dc in [(-2, 0), (2, 0), (0, -2), (0, 2)]
+            if 1 <= r + dr < rows - 1
+            and 1 <= c + dc < cols - 1
+            and grid[r + dr][c + dc] == "#"
+        ]
+        if not options:
+            stack.pop()
+            continue
+        nr, nc, wr, wc = random.choice(options)
+        grid[wr][wc] = "."
+        grid[nr][nc] = "."
+        stack.append((nr, nc))
+
+    for r in range(1, rows - 1):
+        for c in range(1, cols - 1):
+            if grid[r][c] != "#" or random.random() >= loop_ratio:
+                continue
+            if (grid[r - 1][c] != "#" and grid[r + 1][c] != "#") or (
+                grid[r][c - 1] != "#" and grid[r][c + 1] != "#"
+            ):
+                grid[r][c] = "."
+
+    open_cells = [
+        (r, c) for r in range(rows) for c in range(cols) if grid[r][c] != "#"
+    ]
+    for r, c in [open_cells[0], open_cells[-1]]:
+        grid[r][c] = "o"
+    center = min(
+        open_cells,
+        key=lambda rc: abs(rc[0] - rows // 2) + abs(rc[1] - cols // 2),
+    )
+    grid[center[0]][center[1]] = "M"
+    spawns = sorted(
+        (rc for rc in open_cells if grid[rc[0]][rc[1]] == "."),
+        key=lambda rc: abs(rc[0] - center[0]) + abs(rc[1] - center[1]),
+    )[4:8]
+    for (r, c), g in zip(spawns, ["C", "I", "B", "P"]):
+        grid[r][c] = g
+
+    return grid
+
+
 def print_map(grid):
     for row in grid:
         print("".join(row))
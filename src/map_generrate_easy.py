@@ -1,5 +1,5 @@
 import random
-from collections import deque
+from bitboard import Bitboard, popcount
 
 ROWS, COLS = 31, 28
 WALL_RATIO = 0.3
@@ -31,17 +31,8 @@ def neighbors(r, c):
 
 
 def bfs_connected_area(grid, start):
-    visited = set([start])
-    q = deque([start])
-    count = 1
-    while q:
-        r, c = q.popleft()
-        for nr, nc in neighbors(r, c):
-            if (nr, nc) not in visited and grid[nr][nc] != "#":
-                visited.add((nr, nc))
-                q.append((nr, nc))
-                count += 1
-    return count
+    r, c = start
+    return popcount(Bitboard(grid).reachable((c, r)))
 
 
 def get_total_free(grid):
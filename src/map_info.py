@@ -0,0 +1,38 @@
+from algorithms import get_grid
+
+
+class MapInfo:
+    # Thông tin tĩnh của map tính một lần khi nạp (kích thước, mật độ tường,
+    # số ô trống, ngã rẽ, ngõ cụt); số pellet / power pellet còn lại được
+    # cập nhật qua eat() mà main gọi mỗi khi Pacman ăn một ô
+    def __init__(self, map_data):
+        self.height, self.width = len(map_data), len(map_data[0])
+        self.size = self.height * self.width
+        self.wall_count = sum(row.count("#") for row in map_data)
+        self.density = self.wall_count / self.size if self.size else 0.0
+        graph = get_grid(map_data)
+        self.open_cells = graph.size
+        self.junction_count = int((graph.exits >= 3).sum())
+        self.dead_end_count = int((graph.exits <= 1).sum())
+        self.pellets = sum(row.count(".") for row in map_data)
+        self.powerups = sum(row.count("o") for row in map_data)
+
+    def eat(self, tile):
+        if tile == ".":
+            self.pellets -= 1
+        elif tile == "o":
+            self.powerups -= 1
+
+    def items_left(self):
+        return self.pellets + self.powerups
+
+
+_last_map = None
+_last_info = None
+
+
+def get_map_info(map_data):
+    global _last_map, _last_info
+    if map_data is not _last_map:
+        _last_map, _last_info = map_data, MapInfo(map_data)
+    return _last_info
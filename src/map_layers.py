@@ -0,0 +1,67 @@
+import pygame
+
+TILE_SIZE = 20
+BLACK = (0, 0, 0)
+BLUE = (0, 0, 255)
+YELLOW = (255, 255, 0)
+ORANGE = (255, 150, 0)
+
+
+def tile_rect(pos):
+    # Vùng màn hình của một ô map, dùng chung cho lớp vẽ và renderer
+    return pygame.Rect(
+        int(pos[0]) * TILE_SIZE, int(pos[1]) * TILE_SIZE, TILE_SIZE, TILE_SIZE
+    )
+
+
+def _display_format(surface):
+    # convert() cần display đã set_mode; chạy không có cửa sổ thì giữ nguyên
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert()
+
+
+class MapLayers:
+    # Hai lớp vẽ sẵn của một map: walls (tường trên nền đen, không đổi) và
+    # pellets (pellet / power pellet, màu đen là trong suốt). Mỗi frame chỉ
+    # blit hai surface; ăn pellet thì xóa đúng ô đó trên lớp pellets
+    def __init__(self, map_data):
+        size = (len(map_data[0]) * TILE_SIZE, len(map_data) * TILE_SIZE)
+        self.walls = _display_format(pygame.Surface(size))
+        self.walls.fill(BLACK)
+        self.pellets = _display_format(pygame.Surface(size))
+        self.pellets.fill(BLACK)
+        self.pellets.set_colorkey(BLACK)
+        for y, row in enumerate(map_data):
+            for x, tile in enumerate(row):
+                rect = tile_rect((x, y))
+                if tile == "#":
+                    pygame.draw.rect(self.walls, BLUE, rect)
+                elif tile == ".":
+                    pygame.draw.circle(self.pellets, YELLOW, rect.center, 3)
+                elif tile == "o":
+                    pygame.draw.circle(self.pellets, ORANGE, rect.center, 6)
+
+    def eat(self, pos):
+        self.pellets.fill(BLACK, tile_rect(pos))
+
+    def draw(self, screen):
+        screen.blit(self.walls, (0, 0))
+        screen.blit(self.pellets, (0, 0))
+
+    def restore(self, screen, rect):
+        # Vẽ lại nền map trong một vùng (dùng khi chỉ cập nhật rect bẩn)
+        screen.blit(self.walls, rect, rect)
+        screen.blit(self.pellets, rect, rect)
+
+
+_last_map = None
+_last_layers = None
+
+
+def get_map_layers(map_data):
+    # Lớp pellets theo dõi pellet nên gắn với chính đối tượng map
+    global _last_map, _last_layers
+    if map_data is not _last_map:
+        _last_map, _last_layers = map_data, MapLayers(map_data)
+    return _last_layers
@@ -0,0 +1,391 @@
+import math
+import os
+import random
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from algorithms import get_grid, wall_key
+from adversarial import (
+    PELLET_REWARD,
+    POWER_REWARD,
+    GHOST_REWARD,
+    food_distances,
+    food_distances_from,
+)
+
+SEARCH_TIME_MS = 5.0
+ROLLOUT_DEPTH = 20
+ROLLOUTS_PER_BATCH = 16
+DISCOUNT = 0.97
+EXPLORATION = 1.4
+DEATH_PENALTY = -500
+WIN_REWARD = 1000
+
+# Luật game tính theo bước ô của Pacman (2 px/frame, ô 20 px = 10 frame):
+# ghost đi 1 px/frame nên cứ hai bước Pacman thì ghost đi một ô, 420 frame
+# hoảng sợ tương đương 42 bước
+FRIGHT_STEPS = 42
+CHASE_PROB = 0.6
+# Số trường khoảng cách tới pellet mỗi tiến trình con giữ lại
+WORKER_FOOD_CACHE = 64
+
+_contexts = {}
+_pool = None
+_workers = 0
+_pool_graph = None
+_pool_key = None
+# Trạng thái riêng của tiến trình con, đặt một lần bởi _init_worker
+_worker_context = None
+_worker_food = OrderedDict()
+
+
+def get_context(map_data):
+    # (đồ thị lưới, hàm khoảng cách) không phụ thuộc pygame, dùng được
+    # trong cả tiến trình chính lẫn tiến trình con
+    graph = get_grid(map_data)
+    context = _contexts.get(id(graph))
+    if context is None or context[0] is not graph:
+        table = graph.distances
+        size, xs, ys = graph.size, graph.xs, graph.ys
+        if table is not None:
+            dist = table.dist
+
+            def distance(a, b):
+                return dist[a * size + b]
+
+        else:
+
+            def distance(a, b):
+                return abs(xs[a] - xs[b]) + abs(ys[a] - ys[b])
+
+        context = _contexts[id(graph)] = (graph, distance)
+    return context
+
+
+def ghost_step(context, cell, prev, pac, frightened, rng):
+    # Giống Ghost.update: hoảng sợ thì chạy xa Pacman, không thì 60% đuổi
+    # theo đường ngắn nhất, còn lại đi thẳng / rẽ ngẫu nhiên không quay đầu
+    graph, distance = context
+    options = graph.neighbors[cell]
+    if frightened:
+        return max(options, key=lambda v: distance(v, pac))
+    if rng.random() < CHASE_PROB:
+        return min(options, key=lambda v: distance(v, pac))
+    if prev >= 0:
+        ahead = graph.cell_id(
+            (
+                2 * graph.xs[cell] - graph.xs[prev],
+                2 * graph.ys[cell] - graph.ys[prev],
+            )
+        )
+        if ahead >= 0:
+            return ahead
+    forward = [v for v in options if v != prev]
+    return rng.choice(forward or options)
+
+
+def advance(context, state, action, rng):
+    # state = (pac, prev, ghosts, pellets, power, parity); ghosts là tuple
+    # (ô, ô trước, số bước còn hoảng sợ), ô -1 là ghost đã bị ăn
+    pac, _, ghosts, pellets, power, parity = state
+    reward = 0
+    ghosts = list(ghosts)
+    if action in pellets:
+        pellets = pellets - {action}
+        reward += PELLET_REWARD
+    elif action in power:
+        power = power - {action}
+        reward += POWER_REWARD
+        ghosts = [
+            (cell, prev, FRIGHT_STEPS if cell >= 0 else 0)
+            for cell, prev, _ in ghosts
+        ]
+    for i, (cell, prev, fright) in enumerate(ghosts):
+        if cell < 0:
+            continue
+        if parity:
+            old = cell
+            cell = ghost_step(context, cell, prev, action, fright > 0, rng)
+            prev = old
+            swapped = cell == pac and old == action
+        else:
+            swapped = False
+        if cell == action or swapped:
+            if fright <= 0:
+                return None, reward + DEATH_PENALTY, True
+            reward += GHOST_REWARD
+            cell = -1
+        ghosts[i] = (cell, prev, max(0, fright - 1))
+    done = not pellets and not power
+    if done:
+        reward += WIN_REWARD
+    new_state = (action, pac, tuple(ghosts), pellets, power, not parity)
+    return new_state, reward, done
+
+
+def pacman_policy(context, state, food, rng):
+    # Rollout có định hướng: tránh ô sát ghost đang đuổi, ăn pellet kề bên,
+    # không thì đi theo trường khoảng cách tới pellet (tính ở gốc)
+    graph, _ = context
+    pac, prev, ghosts, pellets, power, _ = state
+    danger = set()
+    for cell, _, fright in ghosts:
+        if cell >= 0 and fright <= 0:
+            danger.add(cell)
+            danger.update(graph.neighbors[cell])
+    options = graph.neighbors[pac]
+    safe = [v for v in options if v not in danger] or options
+    if rng.random() < 0.05:
+        return rng.choice(safe)
+    eat = [v for v in safe if v in pellets or v in power]
+    if eat:
+        return rng.choice(eat)
+    forward = [v for v in safe if v != prev] or safe
+    return min(forward, key=lambda v: food[v])
+
+
+def rollout(context, state, food, rng, depth=ROLLOUT_DEPTH):
+    total, scale = 0.0, 1.0
+    for _ in range(depth):
+        action = pacman_policy(context, state, food, rng)
+        state, reward, done = advance(context, state, action, rng)
+        total += scale * reward
+        if done:
+            return total
+        scale *= DISCOUNT
+    # Cắt rollout: trừ khoảng cách còn lại tới pellet gần nhất
+    return total - scale * min(food[state[0]], ROLLOUT_DEPTH)
+
+
+def _init_worker(rows):
+    # Map chỉ gửi sang tiến trình con một lần khi tạo pool; rows là các hàng
+    # map dạng chuỗi
+    global _worker_context
+    _worker_context = get_context([list(row) for row in rows])
+    _worker_food.clear()
+
+
+def _food_for(graph, items):
+    # Trường khoảng cách tới pellet tính từ chính tập pellet của trạng thái
+    # bắt đầu rollout nên mỗi batch chỉ cần gửi trạng thái
+    food = _worker_food.get(items)
+    if food is None:
+        food = _worker_food[items] = food_distances_from(graph, items)
+        if len(_worker_food) > WORKER_FOOD_CACHE:
+            _worker_food.popitem(last=False)
+    else:
+        _worker_food.move_to_end(items)
+    return food
+
+
+def rollout_batch(state, count, seed):
+    # Chạy trong tiến trình con đã được _init_worker nạp map
+    context = _worker_context
+    food = _food_for(context[0], state[3] | state[4])
+    rng = random.Random(seed)
+    return sum(rollout(context, state, food, rng) for _ in range(count))
+
+
+def get_pool(graph, map_data):
+    global _pool, _workers, _pool_graph, _pool_key
+    if graph is not _pool_graph:
+        # Đổi bố cục tường thì tạo pool mới để nạp map mới cho tiến trình con
+        key = wall_key(map_data)
+        if key != _pool_key:
+            shutdown_pool()
+            _pool_key = key
+        _pool_graph = graph
+    if _pool is None:
+        # Chừa một lõi cho vòng lặp game
+        _workers = max(1, (os.cpu_count() or 1) - 1)
+        try:
+            _pool = ProcessPoolExecutor(
+                max_workers=_workers,
+                initializer=_init_worker,
+                initargs=(tuple("".join(row) for row in map_data),),
+            )
+        except (OSError, NotImplementedError) as e:
+            print(f"MCTS process pool unavailable: {e}. Running inline.")
+            _pool = False
+    return _pool or None
+
+
+def shutdown_pool():
+    global _pool, _pool_graph, _pool_key
+    if _pool:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_graph = _pool_key = None
+
+
+class Node:
+    __slots__ = ("cell", "children", "untried", "visits", "total", "pending")
+
+    def __init__(self, cell, actions):
+        self.cell = cell
+        self.children = {}
+        self.untried = list(actions)
+        self.visits = 0
+        self.total = 0.0
+        self.pending = 0
+
+    def ucb_child(self, low, high):
+        # Giá trị chuẩn hóa về [0, 1] theo khoảng lợi nhuận đã gặp; rollout
+        # đang chạy ở tiến trình con tính như lượt thua (virtual loss) để
+        # các batch sau tỏa sang nhánh khác
+        log_n = math.log(self.visits + self.pending + 1)
+        span = max(high - low, 1e-9)
+
+        def score(child):
+            n = child.visits + child.pending
+            if not n:
+                return float("inf")
+            q = (child.total - low * child.visits) / span / n
+            return q + EXPLORATION * math.sqrt(log_n / n)
+
+        return max(self.children.values(), key=score)
+
+
+class MCTSPlanner:
+    # Cây MCTS vòng hở theo chuỗi nước đi của Pacman; ghost được lấy mẫu lại
+    # mỗi lần đi xuống. Rollout gửi theo batch sang ProcessPoolExecutor và
+    # được thu về ở các tick sau; cây giữ lại giữa các tick bằng cách lấy
+    # con đã chọn làm gốc mới
+    def __init__(self, time_ms=SEARCH_TIME_MS, use_pool=True):
+        self.time_ms = time_ms
+        self.use_pool = use_pool
+        self.root = None
+        self.graph = None
+        self.inflight = []
+        self.rng = random.Random()
+        self.rollouts = 0
+        self.low, self.high = 0.0, 0.0
+        self.iterations = 0
+        self.expanded = 0
+
+    def _reroot(self, graph, start_id):
+        if self.root is not None and graph is self.graph:
+            if self.root.cell == start_id:
+                return
+            child = self.root.children.get(start_id)
+            if child is not None:
+                self.root = child
+                return
+        self.graph = graph
+        self.root = Node(start_id, graph.neighbors[start_id])
+
+    def _observe(self, value):
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+
+    def _select(self, context, state):
+        node = self.root
+        path = [node]
+        reward, scale, done = 0.0, 1.0, False
+        while not done:
+            if node.untried:
+                action = node.untried.pop(self.rng.randrange(len(node.untried)))
+                child = Node(action, context[0].neighbors[action])
+                node.children[action] = child
+            elif node.children:
+                child = node.ucb_child(self.low, self.high)
+            else:
+                break
+            state, r, done = advance(context, state, child.cell, self.rng)
+            reward += scale * r
+            scale *= DISCOUNT
+            path.append(child)
+            node = child
+            if child.visits + child.pending == 0:
+                break
+        return path, state, reward, scale, done
+
+    def _collect(self):
+        pending = []
+        for future, path, reward, scale, count in self.inflight:
+            if not future.done():
+                pending.append((future, path, reward, scale, count))
+                continue
+            try:
+                total, count_done = future.result(), count
+            except Exception as e:
+                print(f"MCTS rollout batch failed: {e}")
+                total, count_done = 0.0, 0
+            for node in path:
+                node.pending -= count
+                node.visits += count_done
+                node.total += count_done * reward + scale * total
+            if count_done:
+                self._observe(reward + scale * total / count_done)
+            self.rollouts += count_done
+        self.inflight = pending
+
+    def direction(self, map_data, start, ghosts):
+        # ghosts: danh sách ((x, y), (dx, dy), số frame hoảng sợ còn lại)
+        context = get_context(map_data)
+        graph = context[0]
+        start_id = graph.cell_id(start)
+        if start_id < 0 or not graph.neighbors[start_id]:
+            return None
+        pellets, power = set(), set()
+        for cid, (x, y) in enumerate(graph.cells):
+            tile = map_data[y][x]
+            if tile == ".":
+                pellets.add(cid)
+            elif tile == "o":
+                power.add(cid)
+        ghost_state = []
+        for pos, direction, fright_frames in ghosts:
+            cell = graph.cell_id(pos)
+            prev = graph.cell_id((pos[0] - direction[0], pos[1] - direction[1]))
+            if cell >= 0:
+                ghost_state.append((cell, prev, fright_frames // 10))
+        root_state = (
+            start_id,
+            -1,
+            tuple(ghost_state),
+            frozenset(pellets),
+            frozenset(power),
+            True,
+        )
+
+        food = food_distances(graph, map_data)
+        self.expanded = 0
+        self._reroot(graph, start_id)
+        self._collect()
+        pool = get_pool(graph, map_data) if self.use_pool else None
+        max_inflight = 2 * _workers if pool else 0
+        deadline = time.perf_counter() + self.time_ms / 1000
+        while time.perf_counter() < deadline:
+            path, state, reward, scale, done = self._select(context, root_state)
+            self.iterations += 1
+            self.expanded += 1
+            if not done and len(self.inflight) < max_inflight:
+                count = ROLLOUTS_PER_BATCH
+                future = pool.submit(
+                    rollout_batch, state, count, self.rng.getrandbits(32)
+                )
+                for node in path:
+                    node.pending += count
+                self.inflight.append((future, path, reward, scale, count))
+                continue
+            # Không có pool hoặc pool đã bận: chạy một rollout ngay tại đây
+            total = 0.0 if done else rollout(context, state, food, self.rng)
+            for node in path:
+                node.visits += 1
+                node.total += reward + scale * total
+            self._observe(reward + scale * total)
+            self.rollouts += 1
+
+        if not self.root.children:
+            return None
+        # Chọn theo giá trị trung bình: với ít rollout, số lượt thăm các nhánh
+        # gần bằng nhau, chọn theo lượt thăm làm Pacman đổi hướng liên tục
+        best = max(
+            self.root.children.values(),
+            key=lambda c: c.total / c.visits if c.visits else float("-inf"),
+        )
+        return (
+            graph.xs[best.cell] - graph.xs[start_id],
+            graph.ys[best.cell] - graph.ys[start_id],
+        )
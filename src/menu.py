@@ -1,6 +1,7 @@
 import pygame
 import sys
 from button import Button
+from planners import registry
 
 
 def get_font(size):
@@ -197,6 +198,8 @@ def show_controls(screen, from_main_menu=False):
     controls = [
         "Arrow Keys: Move Pacman",
         "ESC: Pause Game",
+        "A: Toggle background planning",
+        "D: Toggle dirty-rect rendering",
         "M: Back to main menu (paused/ game over)",
         "R: Play Again (game over)",
         "Q: Quit Game (game over)",
@@ -297,40 +300,23 @@ def mode_selection_menu(screen):
     title = font.render("SELECT MODE", True, (255, 255, 0))
     screen.blit(title, title.get_rect(center=(screen.get_width() // 2, 100)))
 
-    a_star_button = Button(
-        image=None,
-        pos=(screen.get_width() // 2, 220),
-        text_input="A* Mode",
-        font=get_font(40),
-        base_color="White",
-        hovering_color="Red",
-    )
-    bfs_button = Button(
-        image=None,
-        pos=(screen.get_width() // 2, 280),
-        text_input="BFS Mode",
-        font=get_font(40),
-        base_color="White",
-        hovering_color="Green",
-    )
-    dfs_button = Button(
-        image=None,
-        pos=(screen.get_width() // 2, 340),
-        text_input="DFS Mode",
-        font=get_font(40),
-        base_color="White",
-        hovering_color="Blue",
-    )
-    ucs_button = Button(
-        image=None,
-        pos=(screen.get_width() // 2, 400),
-        text_input="Uniform_Cost Mode",
-        font=get_font(40),
-        base_color="White",
-        hovering_color="Yellow",
-    )
-
-    buttons = [a_star_button, bfs_button, dfs_button, ucs_button]
+    # Nút lấy từ registry; khoảng cách và cỡ chữ co lại theo số thuật toán
+    names = registry.names()
+    top, bottom = 150, screen.get_height() - 50
+    spacing = min(50, (bottom - top) // max(1, len(names) - 1))
+    button_font = get_font(min(40, spacing))
+    buttons = []
+    for i, name in enumerate(names):
+        spec = registry.get(name)
+        button = Button(
+            image=None,
+            pos=(screen.get_width() // 2, top + i * spacing),
+            text_input=spec.label,
+            font=button_font,
+            base_color="White",
+            hovering_color=spec.color,
+        )
+        buttons.append(button)
 
     while True:
         mouse_pos = pygame.mouse.get_pos()
@@ -343,18 +329,10 @@ def mode_selection_menu(screen):
                 pygame.quit()
                 sys.exit()
             if event.type == pygame.MOUSEBUTTONDOWN:
-                if a_star_button.checkForInput(mouse_pos):
-                    map_choice = map_selection_menu(screen)
-                    return map_choice, "a_star"
-                elif bfs_button.checkForInput(mouse_pos):
-                    map_choice = map_selection_menu(screen)
-                    return map_choice, "bfs"
-                elif dfs_button.checkForInput(mouse_pos):
-                    map_choice = map_selection_menu(screen)
-                    return map_choice, "dfs"
-                elif ucs_button.checkForInput(mouse_pos):
-                    map_choice = map_selection_menu(screen)
-                    return map_choice, "ucs"
+                for name, button in zip(names, buttons):
+                    if button.checkForInput(mouse_pos):
+                        map_choice = map_selection_menu(screen)
+                        return map_choice, name
 
         pygame.display.flip()
 
@@ -1,19 +1,38 @@
 import pygame
 import os
 import random
+import time
+import numpy as np
 from algorithms import (
-    a_star_direction,
-    bfs_direction,
-    ucs_direction,
-    dfs_direction,
+    UNREACHABLE,
+    distances_from,
+    get_grid,
+    ghost_distance_field,
+    maze_distance,
+    nearest_target,
 )
+from planners import registry, PlanRequest
+from async_planner import AsyncPlan
+from pellet_index import get_pellet_index
+from map_info import get_map_info
+from sprite_loader import load_sprite, precompute_variants, sprite_variant
+from scheduler import DecisionScheduler, at_tile_center
 
 TILE_SIZE = 20
+# Góc xoay sprite theo hướng đi (sprite gốc quay sang trái)
+ANGLES = {(1, 0): -180, (0, -1): -90, (-1, 0): 0, (0, 1): 90}
+# Alpha khi nhấp nháy lúc bất tử và khi chết
+DRAW_ALPHAS = (128, 255)
 
 
 class Pacman:
     def __init__(
-        self, x, y, sprite_folder="../assets/sprites/pacman", algorithm="a_star"
+        self,
+        x,
+        y,
+        sprite_folder="../assets/sprites/pacman",
+        algorithm="a_star",
+        async_planning=False,
     ):
         self.start_x = x
         self.start_y = y
@@ -31,20 +50,25 @@ class Pacman:
         self.death_time = None
         self.respawn_time = pygame.time.get_ticks()
         self.algorithm = algorithm
+        # Trạng thái riêng của thuật toán (D* Lite, anytime, MCTS...) nếu có
+        self.planner_state = registry.create_state(algorithm)
+        self.async_plan = None
+        self.scheduler = DecisionScheduler()
+        self.set_async_planning(async_planning)
 
         self.chase_ghosts = False
         self.chase_timer = 0
         self.eatGhost = 0
 
         self.frames = [
-            pygame.transform.scale(
-                pygame.image.load(
-                    os.path.join(sprite_folder, f"pacman{i}.png")
-                ).convert_alpha(),
+            load_sprite(
+                os.path.join(sprite_folder, f"pacman{i}.png"),
                 (TILE_SIZE, TILE_SIZE),
             )
             for i in range(1, 5)
         ]
+        # Mọi tổ hợp khung hình x hướng x alpha tạo sẵn một lần
+        precompute_variants(self.frames, ANGLES.values(), DRAW_ALPHAS)
         self.current_frame = 0
         self.frame_delay = 100
         self.last_update_time = pygame.time.get_ticks()
@@ -53,6 +77,7 @@ class Pacman:
         self.grid_pos = pygame.Vector2(self.start_x, self.start_y)
         self.pixel_pos = self.grid_pos * TILE_SIZE
         self.set_direction(0, 0)
+        self.scheduler.reset()
         self.fade_alpha = 255
         self.alive = True
         self.invincible = False
@@ -62,41 +87,57 @@ class Pacman:
         self.chase_timer = 0
         self.eatGhost = 0
 
+    def set_async_planning(self, enabled):
+        # Luồng nền chỉ dùng cho thuật toán đi tới mục tiêu; alpha-beta và
+        # MCTS đã tự giới hạn thời gian mỗi lần gọi. Trả về trạng thái mới
+        spec = registry.get(self.algorithm)
+        enabled = enabled and spec is not None and spec.signature == "target"
+        if enabled == (self.async_plan is not None):
+            return enabled
+        # Việc đang chạy ở luồng nền vẫn giữ trạng thái planner cũ: tạo trạng
+        # thái mới để hai luồng không dùng chung
+        self.planner_state = registry.create_state(self.algorithm)
+        self.async_plan = AsyncPlan() if enabled else None
+        self.scheduler.reset()
+        return enabled
+
     def set_direction(self, dx, dy):
         self.desired_direction = pygame.Vector2(dx, dy)
 
     def find_nearest_item(
         self, map_data, ghost_positions, prioritize_power=False
     ):
-        min_dist = float("inf")
-        nearest = None
         px, py = int(self.grid_pos.x), int(self.grid_pos.y)
-        map_info = self.analyze_map(map_data)
-        powerup_priority = -50 if prioritize_power else 100
+        # Power pellet chỉ được xét khi prioritize_power
+        powerup_priority = self.power_bonus((px, py), ghost_positions)
+
+        def score(pos, tile):
+            dist = maze_distance(map_data, (px, py), pos)
+            priority = powerup_priority if tile == "o" else 0
+            min_ghost_dist = min(
+                [maze_distance(map_data, pos, gp) for gp in ghost_positions],
+                default=float("inf"),
+            )
+            penalty = 50 if min_ghost_dist <= 3 else 0
+            return dist + penalty + priority
+
+        # Chỉ xét các bucket quanh Pacman, dừng khi vòng kế tiếp chắc chắn
+        # không có điểm tốt hơn
+        nearest = get_pellet_index(map_data).nearest(
+            (px, py),
+            score,
+            include_power=prioritize_power,
+            min_bonus=min(0, powerup_priority) if prioritize_power else 0,
+        )
+        return nearest if nearest else (px, py)
+
+    def power_bonus(self, pos, ghost_positions):
         ghost_count_near = sum(
             1
             for gp in ghost_positions
-            if abs(px - gp[0]) + abs(py - gp[1]) <= 5
+            if abs(pos[0] - gp[0]) + abs(pos[1] - gp[1]) <= 5
         )
-        powerup_priority -= 10 * ghost_count_near
-        for y, row in enumerate(map_data):
-            for x, tile in enumerate(row):
-                if tile == "." or (tile == "o" and prioritize_power):
-                    dist = abs(px - x) + abs(py - y)
-                    priority = powerup_priority if tile == "o" else 0
-                    min_ghost_dist = min(
-                        [
-                            abs(x - gp[0]) + abs(y - gp[1])
-                            for gp in ghost_positions
-                        ],
-                        default=float("inf"),
-                    )
-                    penalty = 50 if min_ghost_dist <= 3 else 0
-                    score = dist + penalty + priority
-                    if score < min_dist:
-                        min_dist = score
-                        nearest = (x, y)
-        return nearest if nearest else (px, py)
+        return -50 - 10 * ghost_count_near
 
     def find_nearest_frightened_ghost(self, ghosts):
         min_dist = float("inf")
@@ -112,52 +153,27 @@ class Pacman:
         return nearest if nearest else (px, py)
 
     def find_safest_position(self, map_data, ghost_positions):
-        max_score = -float("inf")
-        safest_pos = (int(self.grid_pos[0]), int(self.grid_pos[1]))
-        px, py = safest_pos
-        height, width = len(map_data), len(map_data[0])
-        map_info = self.analyze_map(map_data)
-        distance_weight = 0.3 if map_info["size"] < 500 else 0.5
-        for y in range(height):
-            for x in range(width):
-                if map_data[y][x] != "#":
-                    pos = (x, y)
-                    min_dist_to_ghost = min(
-                        [
-                            abs(pos[0] - gp[0]) + abs(pos[1] - gp[1])
-                            for gp in ghost_positions
-                        ],
-                        default=float("inf"),
-                    )
-                    dist_to_pacman = abs(px - x) + abs(py - y)
-                    open_neighbors = sum(
-                        1
-                        for dy, dx in [(0, 1), (0, -1), (1, 0), (-1, 0)]
-                        if 0 <= y + dy < height
-                        and 0 <= x + dx < width
-                        and map_data[y + dy][x + dx] != "#"
-                    )
-                    escape_bonus = 20 * open_neighbors
-                    score = (
-                        min_dist_to_ghost
-                        - distance_weight * dist_to_pacman
-                        + escape_bonus
-                    )
-                    if score > max_score:
-                        max_score = score
-                        safest_pos = pos
-        return safest_pos
-
-    def analyze_map(self, map_data):
-        height, width = len(map_data), len(map_data[0])
-        wall_count = sum(row.count("#") for row in map_data)
-        density = wall_count / (height * width)
-        powerup_count = sum(row.count("o") for row in map_data)
-        return {
-            "size": height * width,
-            "density": density,
-            "powerups": powerup_count,
-        }
+        pacman_pos = (int(self.grid_pos[0]), int(self.grid_pos[1]))
+        graph = get_grid(map_data)
+        if graph.cell_id(pacman_pos) < 0:
+            return pacman_pos
+        ghost_field = ghost_distance_field(map_data, ghost_positions)
+        if not ghost_positions or ghost_field.min() == UNREACHABLE:
+            # Không có ghost nguy hiểm (hoặc mọi ghost nằm ngoài map): bản cũ
+            # chấm mọi ô bằng inf nên giữ ô trống đầu tiên theo thứ tự hàng
+            # (graph.cells xếp theo hàng)
+            return graph.cells[0]
+        distance_weight = 0.3 if get_map_info(map_data).size < 500 else 0.5
+        # Khoảng cách thật tới ghost gần nhất (BFS đa nguồn, cache theo tick)
+        # và tới Pacman, cộng thưởng theo số lối thoát, rồi lấy argmax
+        to_pacman = distances_from(map_data, pacman_pos)
+        score = ghost_field - distance_weight * to_pacman + 20 * graph.exits
+        # Ô Pacman không tới được không bao giờ là đích chạy trốn
+        score[to_pacman == UNREACHABLE] = -np.inf
+        best = np.flatnonzero(score == score.max())
+        # Hòa điểm thì lấy ô đầu tiên theo thứ tự hàng như vòng quét cũ
+        order = graph.np_ys[best] * graph.cols + graph.np_xs[best]
+        return graph.cells[best[np.argmin(order)]]
 
     def predict_ghost_positions(self, ghosts):
         predicted = []
@@ -169,6 +185,162 @@ class Pacman:
                 predicted.append(next_pos)
         return predicted
 
+    def choose_target(
+        self, map_data, ghosts, ghost_positions, pacman_pos, prioritize_power
+    ):
+        target, step = None, None
+        if self.chase_ghosts:
+            frightened = [
+                (int(ghost.grid_pos.x), int(ghost.grid_pos.y))
+                for ghost in ghosts
+                if ghost.alive and ghost.frightened_timer > 0
+            ]
+            target, step = nearest_target(
+                map_data,
+                pacman_pos,
+                ghost_positions,
+                hunt=frightened,
+                pellets=False,
+            )
+        if target is None:
+            target, step = nearest_target(
+                map_data,
+                pacman_pos,
+                ghost_positions,
+                power_bonus=(
+                    self.power_bonus(pacman_pos, ghost_positions)
+                    if prioritize_power
+                    else None
+                ),
+            )
+        if target is None:
+            # Mọi mục tiêu đều nằm sau vùng ghost: chọn theo khoảng cách
+            if self.chase_ghosts:
+                target = self.find_nearest_frightened_ghost(ghosts)
+            else:
+                target = self.find_nearest_item(
+                    map_data, ghost_positions, prioritize_power
+                )
+
+        return target, step
+
+    def plan_request(
+        self, map_data, ghosts, ghost_positions, pacman_pos, ghost_near
+    ):
+        prioritize_power = ghost_near and not self.invincible
+        target, step = None, None
+        step_ms, step_nodes = 0.0, 0
+        spec = registry.get(self.algorithm)
+        if spec is not None and spec.signature == "target":
+            started = time.perf_counter()
+            target, step = self.choose_target(
+                map_data, ghosts, ghost_positions, pacman_pos, prioritize_power
+            )
+            step_ms = (time.perf_counter() - started) * 1000
+            step_nodes = get_grid(map_data).expanded
+        return PlanRequest(
+            map_data,
+            pacman_pos,
+            target,
+            ghosts,
+            ghost_positions,
+            step,
+            step_ms,
+            step_nodes,
+        )
+
+    def resolve_move(self, move, map_data, request):
+        if move is None:
+            move = (0, 0)
+
+        directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+        valid_directions = [
+            (dx, dy)
+            for dx, dy in directions
+            if self.can_move(pygame.Vector2(dx, dy), map_data)
+        ]
+        if move == (0, 0) or not self.can_move(pygame.Vector2(*move), map_data):
+            if self.direction != (0, 0) and self.can_move(
+                self.direction, map_data
+            ):
+                move = (self.direction.x, self.direction.y)
+            elif valid_directions:
+                move = random.choice(valid_directions)
+            else:
+                print(
+                    f"Pacman stuck at {request.start}, no valid directions. Target: {request.target}, Ghost positions: {request.ghost_positions}"
+                )
+        return move
+
+    def plan_move(
+        self, map_data, ghosts, ghost_positions, pacman_pos, ghost_near
+    ):
+        request = self.plan_request(
+            map_data, ghosts, ghost_positions, pacman_pos, ghost_near
+        )
+        move = registry.call(self.algorithm, self.planner_state, request)
+        return self.resolve_move(move, map_data, request)
+
+    def submit_plan(self, map_data, ghosts, ghost_positions, start, ghost_near):
+        # Chọn mục tiêu ở luồng chính (một BFS ngắn), phần tìm đường gửi sang
+        # luồng nền kèm bản chụp bất biến của map và vị trí ghost
+        request = self.plan_request(
+            map_data, ghosts, ghost_positions, start, ghost_near
+        )
+        request.map_data = self.async_plan.snapshot(map_data)
+        request.ghosts = ()
+        request.ghost_positions = tuple(ghost_positions)
+        self.async_plan.submit(self.algorithm, self.planner_state, request)
+
+    def plan_async(self, map_data, ghosts, ghost_positions, pacman_pos, danger):
+        # Kế hoạch được tính trước cho tâm ô kế tiếp trên hướng đang đi, tới
+        # đúng tâm ô đó mới dùng; chưa có kết quả thì đi tiếp hướng đã chốt
+        events = (self.chase_ghosts, self.invincible, danger)
+        result = None
+        if at_tile_center(self.pixel_pos):
+            result = self.async_plan.poll(pacman_pos)
+        if result is not None:
+            request, planned = result
+            move = self.scheduler.commit(
+                self.pixel_pos,
+                pacman_pos,
+                events,
+                self.resolve_move(planned, map_data, request),
+            )
+        elif self.scheduler.due(self.pixel_pos, pacman_pos, events):
+            move = self.scheduler.commit(
+                self.pixel_pos,
+                pacman_pos,
+                events,
+                self.scheduler.decision or (self.direction.x, self.direction.y),
+            )
+        else:
+            return self.scheduler.decision
+        self.submit_plan(
+            map_data,
+            ghosts,
+            ghost_positions,
+            self.next_center(map_data, pacman_pos, move),
+            bool(danger),
+        )
+        return move
+
+    def next_center(self, map_data, pacman_pos, move):
+        # Tâm ô tiếp theo Pacman sẽ đi qua: theo move nếu rẽ được ngay, không
+        # thì theo hướng đang đi; đứng yên thì là ô hiện tại
+        direction = pygame.Vector2(move)
+        if not self.can_move(direction, map_data):
+            direction = self.direction
+            if not self.can_move(direction, map_data):
+                return pacman_pos
+        dx, dy = int(direction.x), int(direction.y)
+        x, y = pacman_pos
+        # Ô làm tròn có thể đã ở phía sau khi Pacman qua nửa ô
+        ahead = self.pixel_pos.x * dx + self.pixel_pos.y * dy
+        if ahead >= (x * dx + y * dy) * TILE_SIZE:
+            x, y = x + dx, y + dy
+        return (x, y)
+
     def ReflexAgent(self, map_data, ghosts):
         now = pygame.time.get_ticks()
         if not self.alive:
@@ -203,75 +375,42 @@ class Pacman:
             predicted_positions = self.predict_ghost_positions(ghosts)
             ghost_positions.extend(predicted_positions)
             pacman_pos = (int(self.grid_pos.x), int(self.grid_pos.y))
-            map_info = self.analyze_map(map_data)
-            ghost_proximity = 3 if map_info["size"] < 500 else 4
-            ghost_near = any(
-                abs(pacman_pos[0] - gp[0]) + abs(pacman_pos[1] - gp[1])
-                <= ghost_proximity
+            ghost_proximity = 3 if get_map_info(map_data).size < 500 else 4
+            danger = tuple(
+                gp
                 for gp in ghost_positions
+                if abs(pacman_pos[0] - gp[0]) + abs(pacman_pos[1] - gp[1])
+                <= ghost_proximity
             )
-
-            if self.chase_ghosts:
-                target = self.find_nearest_frightened_ghost(ghosts)
-            elif ghost_near and not self.invincible:
-                target = self.find_nearest_item(
-                    map_data, ghost_positions, prioritize_power=True
+            # Sự kiện buộc quyết định lại dù chưa tới tâm ô mới: ghost vào
+            # vùng nguy hiểm, ăn power pellet, hết bất tử. Pellet mục tiêu
+            # chỉ biến mất khi Pacman bước vào ô đó, tới tâm ô là tính lại
+            events = (self.chase_ghosts, self.invincible, danger)
+            if self.async_plan is not None:
+                move = self.plan_async(
+                    map_data, ghosts, ghost_positions, pacman_pos, danger
                 )
-            else:
-                target = self.find_nearest_item(
-                    map_data, ghost_positions, prioritize_power=False
-                )
-
-            if self.algorithm == "a_star":
-                move = a_star_direction(
-                    map_data,
-                    pacman_pos,
-                    target,
-                    ghost_positions=ghost_positions,
-                )
-            elif self.algorithm == "bfs":
-                move = bfs_direction(
-                    map_data,
-                    pacman_pos,
-                    target,
-                    ghost_positions=ghost_positions,
-                )
-            elif self.algorithm == "dfs":
-                move = dfs_direction(
-                    map_data,
-                    pacman_pos,
-                    target,
-                    ghost_positions=ghost_positions,
-                )
-            elif self.algorithm == "ucs":
-                move = ucs_direction(
-                    map_data,
+            elif self.scheduler.due(self.pixel_pos, pacman_pos, events):
+                move = self.scheduler.commit(
+                    self.pixel_pos,
                     pacman_pos,
-                    target,
-                    ghost_positions=ghost_positions,
+                    events,
+                    self.plan_move(
+                        map_data,
+                        ghosts,
+                        ghost_positions,
+                        pacman_pos,
+                        bool(danger),
+                    ),
                 )
-            else:
-                move = (0, 0)
-
-            directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-            valid_directions = [
-                (dx, dy)
-                for dx, dy in directions
-                if self.can_move(pygame.Vector2(dx, dy), map_data)
-            ]
-            if move == (0, 0) or not self.can_move(
-                pygame.Vector2(*move), map_data
-            ):
-                if self.direction != (0, 0) and self.can_move(
-                    self.direction, map_data
+                if (
+                    registry.has(self.algorithm, "anytime")
+                    and not self.planner_state.finished
                 ):
-                    move = (self.direction.x, self.direction.y)
-                elif valid_directions:
-                    move = random.choice(valid_directions)
-                else:
-                    print(
-                        f"Pacman stuck at {pacman_pos}, no valid directions. Target: {target}, Ghost positions: {ghost_positions}"
-                    )
+                    # Tìm kiếm theo thời gian chưa xong: frame sau làm tiếp
+                    self.scheduler.reset()
+            else:
+                move = self.scheduler.decision
 
             self.set_direction(move[0], move[1])
 
@@ -337,29 +476,16 @@ class Pacman:
         self.eatGhost = 0
 
     def draw(self, screen):
-        frame = self.frames[self.current_frame]
-        angle = self._get_angle()
-        rotated = pygame.transform.rotate(frame, angle)
-
         if not self.alive:
-            faded = rotated.copy()
-            faded.set_alpha(self.fade_alpha)
-            screen.blit(faded, (int(self.pixel_pos.x), int(self.pixel_pos.y)))
+            alpha = self.fade_alpha
         elif self.invincible:
             alpha = 128 if (pygame.time.get_ticks() // 300) % 2 == 0 else 255
-            faded = rotated.copy()
-            faded.set_alpha(alpha)
-            screen.blit(faded, (int(self.pixel_pos.x), int(self.pixel_pos.y)))
         else:
-            screen.blit(rotated, (int(self.pixel_pos.x), int(self.pixel_pos.y)))
+            alpha = 255
+        sprite = sprite_variant(
+            self.frames[self.current_frame], self._get_angle(), alpha
+        )
+        screen.blit(sprite, (int(self.pixel_pos.x), int(self.pixel_pos.y)))
 
     def _get_angle(self):
-        if self.direction == pygame.Vector2(1, 0):
-            return -180
-        if self.direction == pygame.Vector2(0, -1):
-            return -90
-        if self.direction == pygame.Vector2(-1, 0):
-            return 0
-        if self.direction == pygame.Vector2(0, 1):
-            return 90
-        return 0
+        return ANGLES.get((self.direction.x, self.direction.y), 0)
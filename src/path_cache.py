@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 1024
+_MISSING = object()
+
+
+def freeze(value):
+    # Biến tham số thành khóa hash được: list -> tuple. Không nhận mảng NumPy
+    # (chép cả mảng mỗi lần tra): truyền thứ sinh ra mảng, vd vị trí ghost
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    return value
+
+
+class PathCache:
+    # Cache LRU có giới hạn cho các hàm tìm đường; khóa gồm phiên bản map,
+    # tên thuật toán, start, goal và mọi tham số ảnh hưởng tới chi phí.
+    # func phải tất định: thất bại thì trả None, bước ngẫu nhiên dự phòng do
+    # nơi gọi tự chọn ngoài cache (không thì cache sẽ lặp lại một bước ngẫu
+    # nhiên tới lần ăn pellet sau)
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Luồng lập kế hoạch nền cũng gọi vào cache; hàm tìm đường chạy ngoài
+        # khóa nên chỉ thao tác trên entries mới cần giữ khóa
+        self.lock = threading.Lock()
+
+    def invalidate(self):
+        # Gọi khi ăn pellet hoặc thay map trong reset_game
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+
+    def call(self, name, func, map_data, start, goal, **kwargs):
+        if start == goal:
+            # Kết quả khi đã tới goal là ngẫu nhiên, không nên cache
+            return func(map_data, start, goal, **kwargs)
+        key = (self.version, name, tuple(start), tuple(goal), freeze(kwargs))
+        with self.lock:
+            value = self.entries.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            else:
+                self.misses += 1
+        if value is _MISSING:
+            value = func(map_data, start, goal, **kwargs)
+            with self.lock:
+                # Kết quả tính trên map cũ (invalidate chạy giữa chừng) không
+                # bao giờ được đọc lại, lưu vào chỉ đẩy các mục còn dùng ra
+                if key[0] == self.version:
+                    self.entries[key] = value
+                    if len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+                        self.evictions += 1
+        return list(value) if isinstance(value, list) else value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "version": self.version,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+path_cache = PathCache()
@@ -0,0 +1,98 @@
+BUCKET_SIZE = 4
+INF = float("inf")
+
+
+class PelletIndex:
+    # Chia map thành các ô vuông BUCKET_SIZE x BUCKET_SIZE, mỗi ô giữ tập
+    # pellet/power pellet bên trong; truy vấn gần nhất đi theo vòng ô vuông
+    def __init__(self, map_data, bucket_size=BUCKET_SIZE):
+        self.map_data = map_data
+        self.bucket_size = bucket_size
+        self.bucket_rows = (len(map_data) + bucket_size - 1) // bucket_size
+        self.bucket_cols = (len(map_data[0]) + bucket_size - 1) // bucket_size
+        self.buckets = [
+            [{} for _ in range(self.bucket_cols)]
+            for _ in range(self.bucket_rows)
+        ]
+        self.pellet_count = 0
+        self.power_count = 0
+        for y, row in enumerate(map_data):
+            for x, tile in enumerate(row):
+                if tile == "." or tile == "o":
+                    self._bucket((x, y))[(x, y)] = tile
+                    if tile == ".":
+                        self.pellet_count += 1
+                    else:
+                        self.power_count += 1
+
+    def _bucket(self, pos):
+        return self.buckets[pos[1] // self.bucket_size][
+            pos[0] // self.bucket_size
+        ]
+
+    def remove(self, pos):
+        pos = (int(pos[0]), int(pos[1]))
+        tile = self._bucket(pos).pop(pos, None)
+        if tile == ".":
+            self.pellet_count -= 1
+        elif tile == "o":
+            self.power_count -= 1
+        return tile
+
+    def remaining(self):
+        return self.pellet_count + self.power_count
+
+    def _ring(self, origin, ring):
+        bx = int(origin[0]) // self.bucket_size
+        by = int(origin[1]) // self.bucket_size
+        for y in range(by - ring, by + ring + 1):
+            if not 0 <= y < self.bucket_rows:
+                continue
+            if abs(y - by) == ring:
+                xs = range(bx - ring, bx + ring + 1)
+            else:
+                xs = (bx - ring, bx + ring) if ring else (bx,)
+            for x in xs:
+                if 0 <= x < self.bucket_cols:
+                    yield self.buckets[y][x]
+
+    def nearest(self, origin, score, include_power=False, min_bonus=0):
+        # score(pos, tile) phải >= khoảng cách Manhattan + min_bonus để có thể
+        # dừng sớm: ô ở vòng r cách origin ít nhất (r - 1) * bucket_size + 1.
+        # Hòa điểm thì chọn (y, x) nhỏ nhất, giống duyệt map theo từng hàng
+        best_score, best_pos = INF, None
+        max_ring = max(self.bucket_rows, self.bucket_cols)
+        for ring in range(max_ring + 1):
+            if (
+                ring
+                and (ring - 1) * self.bucket_size + 1 + min_bonus > best_score
+            ):
+                break
+            for bucket in self._ring(origin, ring):
+                for pos, tile in list(bucket.items()):
+                    if self.map_data[pos[1]][pos[0]] != tile:
+                        # Map đã bị sửa mà không gọi remove: dọn luôn
+                        self.remove(pos)
+                        continue
+                    if tile == "o" and not include_power:
+                        continue
+                    value = score(pos, tile)
+                    # Điểm INF không bao giờ được chọn, như vòng quét cũ dùng <
+                    if value < best_score or (
+                        best_pos is not None
+                        and value == best_score
+                        and (pos[1], pos[0]) < (best_pos[1], best_pos[0])
+                    ):
+                        best_score, best_pos = value, pos
+        return best_pos
+
+
+_last_map = None
+_last_index = None
+
+
+def get_pellet_index(map_data):
+    global _last_map, _last_index
+    if map_data is not _last_map:
+        _last_map, _last_index = map_data, PelletIndex(map_data)
+    return _last_index
@@ -0,0 +1,449 @@
+import bisect
+import time
+from algorithms import (
+    a_star_search,
+    bfs_step,
+    dfs_step,
+    danger_field,
+    get_grid,
+)
+from anytime import AnytimePlanner
+from d_star_lite import DStarLite
+from junction_graph import get_junction_graph
+from landmarks import get_landmarks
+from hpa_star import get_hierarchy
+from adversarial import AlphaBetaPlanner
+from mcts import MCTSPlanner
+from path_cache import path_cache
+
+# Cận trên (ms) các ô của histogram độ trễ, ô cuối chứa phần còn lại
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2, 4, 8, 16)
+
+
+class PlanRequest:
+    # Dữ liệu một lần lập kế hoạch: target là ô mục tiêu (None với thuật toán
+    # kiểu "ghosts"), step là bước đầu BFS mà nearest_target đã tìm được,
+    # step_ms / step_nodes là thời gian và số nút của BFS chọn mục tiêu đó
+    def __init__(
+        self,
+        map_data,
+        start,
+        target,
+        ghosts,
+        ghost_positions,
+        step=None,
+        step_ms=0.0,
+        step_nodes=0,
+    ):
+        self.map_data = map_data
+        self.start = start
+        self.target = target
+        self.ghosts = ghosts
+        self.ghost_positions = ghost_positions
+        self.step = step
+        self.step_ms = step_ms
+        self.step_nodes = step_nodes
+
+
+class PlannerSpec:
+    # signature: "target" (đi tới một ô mục tiêu) hoặc "ghosts" (tự đánh giá
+    # cả bàn cờ từ vị trí ghost, không cần mục tiêu). plan(state, request)
+    # trả về (dx, dy) hoặc None khi không có kế hoạch; factory tạo trạng thái
+    # riêng cho mỗi Pacman; nodes(state, map_data) là số nút lần gọi vừa rồi.
+    # Capability "target_step": dùng lại request.step nên call() ghi nhận
+    # step_ms / step_nodes của BFS chọn mục tiêu
+    def __init__(
+        self,
+        name,
+        plan,
+        label,
+        color,
+        signature,
+        capabilities,
+        factory,
+        nodes,
+    ):
+        self.name = name
+        self.plan = plan
+        self.label = label
+        self.color = color
+        self.signature = signature
+        self.capabilities = frozenset(capabilities)
+        self.factory = factory
+        self.nodes = nodes
+
+
+class PlannerStats:
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.nodes = 0
+        self.fallbacks = 0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, elapsed_ms, nodes, fallback):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.nodes += nodes or 0
+        self.fallbacks += fallback
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+
+class PlannerRegistry:
+    # Danh sách thuật toán của Pacman theo thứ tự đăng ký: menu, kiểm tra
+    # mode hợp lệ và Pacman.plan_move đều đọc từ đây. Mỗi lần gọi qua call()
+    # được đo thời gian, số nút mở rộng và số lần không có kế hoạch (Pacman
+    # phải đi tiếp / đi ngẫu nhiên)
+    def __init__(self):
+        self.specs = {}
+        self.stats_by_name = {}
+
+    def register(
+        self,
+        name,
+        plan,
+        label=None,
+        color="White",
+        signature="target",
+        capabilities=(),
+        factory=None,
+        nodes=None,
+    ):
+        if name in self.specs:
+            raise ValueError(f"Planner {name} is already registered")
+        self.specs[name] = PlannerSpec(
+            name,
+            plan,
+            label or f"{name} Mode",
+            color,
+            signature,
+            capabilities,
+            factory,
+            nodes,
+        )
+        self.stats_by_name[name] = PlannerStats()
+
+    def names(self):
+        return list(self.specs)
+
+    def get(self, name):
+        return self.specs.get(name)
+
+    def has(self, name, capability):
+        spec = self.specs.get(name)
+        return spec is not None and capability in spec.capabilities
+
+    def create_state(self, name):
+        spec = self.specs.get(name)
+        if spec is None or spec.factory is None:
+            return None
+        return spec.factory()
+
+    def call(self, name, state, request):
+        spec = self.specs.get(name)
+        if spec is None:
+            return None
+        start = time.perf_counter()
+        move = spec.plan(state, request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        nodes = spec.nodes(state, request.map_data) if spec.nodes else None
+        if request.step is not None and "target_step" in spec.capabilities:
+            # Bước đầu lấy từ BFS chọn mục tiêu chạy trước call(): tính thời
+            # gian và số nút của BFS đó cho planner
+            elapsed_ms += request.step_ms
+            nodes = request.step_nodes
+        fallback = move is None or move == (0, 0)
+        self.stats_by_name[name].record(elapsed_ms, nodes, fallback)
+        return None if fallback else move
+
+    def stats(self, name=None):
+        if name is None:
+            return {n: self.stats(n) for n in self.specs if self.calls(n)}
+        s = self.stats_by_name[name]
+        return {
+            "calls": s.calls,
+            "avg_ms": s.total_ms / s.calls if s.calls else 0.0,
+            "max_ms": s.max_ms,
+            "avg_nodes": s.nodes / s.calls if s.calls else 0.0,
+            "fallbacks": s.fallbacks,
+            "histogram": dict(
+                zip(
+                    [f"<{b}ms" for b in LATENCY_BUCKETS_MS]
+                    + [f">={LATENCY_BUCKETS_MS[-1]}ms"],
+                    s.histogram,
+                )
+            ),
+        }
+
+    def calls(self, name):
+        return self.stats_by_name[name].calls
+
+    def reset_stats(self):
+        for name in self.stats_by_name:
+            self.stats_by_name[name] = PlannerStats()
+
+
+registry = PlannerRegistry()
+
+
+# ==== THUẬT TOÁN CÓ SẴN ====
+def _grid_nodes(state, map_data):
+    return get_grid(map_data).expanded
+
+
+def _state_nodes(state, map_data):
+    return state.expanded
+
+
+def _bfs(state, request):
+    get_grid(request.map_data).expanded = 0
+    if request.step is not None:
+        # Cùng BFS và vùng chặn như bfs_step nên bước đầu trùng
+        return request.step
+    return path_cache.call(
+        "bfs",
+        bfs_step,
+        request.map_data,
+        request.start,
+        request.target,
+        ghost_positions=request.ghost_positions,
+    )
+
+
+def _dfs(state, request):
+    get_grid(request.map_data).expanded = 0
+    return path_cache.call(
+        "dfs",
+        dfs_step,
+        request.map_data,
+        request.start,
+        request.target,
+        ghost_positions=request.ghost_positions,
+    )
+
+
+def _anytime(state, request):
+    # Tìm kiếm có ngân sách thời gian, chưa xong thì frame sau làm tiếp
+    return state.direction(
+        request.map_data,
+        request.start,
+        request.target,
+        danger_field(request.map_data, request.ghost_positions),
+    )
+
+
+def _anytime_nodes(state, map_data):
+    return state.last_expanded
+
+
+def _d_star_lite(state, request):
+    return state.direction(
+        request.map_data,
+        request.start,
+        request.target,
+        danger_field(request.map_data, request.ghost_positions),
+    )
+
+
+def _junction_step(
+    map_data, start, goal, ghost_positions=None, use_heuristic=True
+):
+    # Nhận vị trí ghost thay cho trường chi phí để khóa cache nhỏ; trường
+    # chi phí đã được danger_field cache theo tick
+    cost_field = danger_field(map_data, ghost_positions)
+    junctions = get_junction_graph(map_data)
+    return junctions.search(
+        start,
+        goal,
+        junctions.graph.step_costs(cost_field),
+        junctions.edge_costs(cost_field),
+        use_heuristic=use_heuristic,
+    )
+
+
+def _junction(use_heuristic):
+    name = "junction_a_star" if use_heuristic else "junction_ucs"
+
+    def plan(state, request):
+        get_junction_graph(request.map_data).expanded = 0
+        return path_cache.call(
+            name,
+            _junction_step,
+            request.map_data,
+            request.start,
+            request.target,
+            ghost_positions=request.ghost_positions,
+            use_heuristic=use_heuristic,
+        )
+
+    return plan
+
+
+def _junction_nodes(state, map_data):
+    return get_junction_graph(map_data).expanded
+
+
+def _alt(state, request):
+    graph = get_grid(request.map_data)
+    start_id = graph.cell_id(request.start)
+    goal_id = graph.cell_id(request.target)
+    graph.expanded = 0
+    if start_id < 0 or goal_id < 0 or start_id == goal_id:
+        return None
+    return a_star_search(
+        graph,
+        start_id,
+        goal_id,
+        graph.step_costs(
+            danger_field(request.map_data, request.ghost_positions)
+        ),
+        get_landmarks(request.map_data).heuristic_to(goal_id),
+    )
+
+
+def _hpa(state, request):
+    return get_hierarchy(request.map_data).direction(
+        request.start,
+        request.target,
+        get_grid(request.map_data).step_costs(
+            danger_field(request.map_data, request.ghost_positions)
+        ),
+    )
+
+
+def _hpa_nodes(state, map_data):
+    return get_hierarchy(map_data).expanded
+
+
+def _alpha_beta(state, request):
+    return state.direction(
+        request.map_data,
+        request.start,
+        [
+            (
+                (int(ghost.grid_pos.x), int(ghost.grid_pos.y)),
+                ghost.frightened_timer > 0,
+            )
+            for ghost in request.ghosts
+            if ghost.alive
+        ],
+    )
+
+
+def _alpha_beta_nodes(state, map_data):
+    return state.nodes
+
+
+def _mcts(state, request):
+    return state.direction(
+        request.map_data,
+        request.start,
+        [
+            (
+                (int(ghost.grid_pos.x), int(ghost.grid_pos.y)),
+                (int(ghost.direction.x), int(ghost.direction.y)),
+                ghost.frightened_timer,
+            )
+            for ghost in request.ghosts
+            if ghost.alive
+        ],
+    )
+
+
+registry.register(
+    "a_star",
+    _anytime,
+    label="A* Mode",
+    color="Red",
+    capabilities=("anytime", "cost_field"),
+    factory=AnytimePlanner,
+    nodes=_anytime_nodes,
+)
+registry.register(
+    "bfs",
+    _bfs,
+    label="BFS Mode",
+    color="Green",
+    capabilities=("cached", "target_step"),
+    nodes=_grid_nodes,
+)
+registry.register(
+    "dfs",
+    _dfs,
+    label="DFS Mode",
+    color="Blue",
+    capabilities=("cached",),
+    nodes=_grid_nodes,
+)
+registry.register(
+    "ucs",
+    _anytime,
+    label="Uniform_Cost Mode",
+    color="Yellow",
+    capabilities=("anytime", "cost_field"),
+    factory=lambda: AnytimePlanner(use_heuristic=False),
+    nodes=_anytime_nodes,
+)
+registry.register(
+    "d_star_lite",
+    _d_star_lite,
+    label="D* Lite Mode",
+    color="Orange",
+    capabilities=("incremental", "cost_field"),
+    factory=DStarLite,
+    nodes=_state_nodes,
+)
+registry.register(
+    "junction_a_star",
+    _junction(True),
+    label="Junction A* Mode",
+    color="Cyan",
+    capabilities=("cached", "cost_field"),
+    nodes=_junction_nodes,
+)
+registry.register(
+    "junction_ucs",
+    _junction(False),
+    label="Junction UCS Mode",
+    color="Magenta",
+    capabilities=("cached", "cost_field"),
+    nodes=_junction_nodes,
+)
+registry.register(
+    "alt",
+    _alt,
+    label="ALT A* Mode",
+    color="Gold",
+    capabilities=("cost_field",),
+    nodes=_grid_nodes,
+)
+registry.register(
+    "hpa_star",
+    _hpa,
+    label="HPA* Mode",
+    color="Brown",
+    capabilities=("cost_field",),
+    nodes=_hpa_nodes,
+)
+registry.register(
+    "alpha_beta",
+    _alpha_beta,
+    label="Alpha-Beta Mode",
+    color="Purple",
+    signature="ghosts",
+    capabilities=("adversarial",),
+    factory=AlphaBetaPlanner,
+    nodes=_alpha_beta_nodes,
+)
+registry.register(
+    "mcts",
+    _mcts,
+    label="MCTS Mode",
+    color="Pink",
+    signature="ghosts",
+    capabilities=("adversarial", "stochastic"),
+    factory=MCTSPlanner,
+    nodes=_state_nodes,
+)
@@ -0,0 +1,107 @@
+import pygame
+from map_layers import TILE_SIZE, get_map_layers, tile_rect
+
+
+class Renderer:
+    # Vẽ một frame game theo một trong hai chế độ:
+    # - full: fill, vẽ lại map, nhân vật, HUD rồi flip như trước
+    # - dirty: màn hình giữ nguyên giữa các frame, chỉ khôi phục nền (lớp
+    #   tường + pellet) dưới vị trí cũ / mới của nhân vật, ô vừa ăn và HUD,
+    #   vẽ lại rồi display.update đúng các rect đó
+    # Sau menu / set_mode / đổi map phải vẽ lại toàn bộ: gọi invalidate(),
+    # đổi screen hoặc map_data cũng tự vẽ lại toàn bộ. Chế độ ban đầu do
+    # nơi tạo quyết định (main.DIRTY_RECTS)
+    def __init__(self, dirty):
+        self.dirty = dirty
+        self.screen = None
+        self.map_data = None
+        self.stale = True
+        self.entity_rects = []
+        self.hud_rects = []
+        self.tiles = []
+        self.updates = None
+        self.frames = 0
+        self.full_frames = 0
+        self.area = 0.0
+
+    def invalidate(self):
+        self.stale = True
+
+    def toggle(self):
+        self.dirty = not self.dirty
+        self.stale = True
+        return self.dirty
+
+    def mark_tile(self, pos):
+        # Ô map vừa đổi (ăn pellet), vẽ lại ở frame sau
+        self.tiles.append(tile_rect(pos))
+
+    def draw(self, screen, map_data, entities, draw_hud):
+        # entities: các đối tượng có pixel_pos và draw(screen); draw_hud(screen)
+        # trả về danh sách rect đã vẽ
+        layers = get_map_layers(map_data)
+        rects = [
+            pygame.Rect(
+                int(e.pixel_pos.x), int(e.pixel_pos.y), TILE_SIZE, TILE_SIZE
+            )
+            for e in entities
+        ]
+        full = (
+            not self.dirty
+            or self.stale
+            or screen is not self.screen
+            or map_data is not self.map_data
+        )
+        if full:
+            screen.fill((0, 0, 0))
+            layers.draw(screen)
+            dirty = None
+        else:
+            if len(rects) == len(self.entity_rects):
+                # Nhân vật chỉ đi vài px mỗi frame: gộp rect cũ và mới
+                dirty = []
+                for old, new in zip(self.entity_rects, rects):
+                    if old.colliderect(new):
+                        dirty.append(old.union(new))
+                    else:
+                        dirty.extend((old, new))
+            else:
+                dirty = self.entity_rects + rects
+            dirty += self.tiles + self.hud_rects
+            for rect in dirty:
+                layers.restore(screen, rect)
+        for e in entities:
+            e.draw(screen)
+        self.hud_rects = [rect.copy() for rect in draw_hud(screen) or ()]
+        self.entity_rects = rects
+        self.tiles = []
+        self.screen, self.map_data, self.stale = screen, map_data, False
+
+        self.frames += 1
+        screen_area = screen.get_width() * screen.get_height()
+        if dirty is None:
+            self.full_frames += 1
+            self.updates = None
+            self.area += 1.0
+        else:
+            self.updates = dirty + self.hud_rects
+            self.area += sum(r.width * r.height for r in self.updates) / max(
+                screen_area, 1
+            )
+
+    def present(self):
+        # Sau draw(): update các rect bẩn; chưa vẽ frame hoặc đã có menu vẽ
+        # đè lên (invalidate) thì flip cả màn hình
+        if self.updates is None or self.stale:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.updates)
+        self.updates = None
+
+    def stats(self):
+        return {
+            "mode": "dirty" if self.dirty else "full",
+            "frames": self.frames,
+            "full_frames": self.full_frames,
+            "avg_area": self.area / self.frames if self.frames else 0.0,
+        }
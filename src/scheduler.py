@@ -0,0 +1,48 @@
+TILE_SIZE = 20
+
+
+def at_tile_center(pixel_pos):
+    return pixel_pos.x % TILE_SIZE == 0 and pixel_pos.y % TILE_SIZE == 0
+
+
+class DecisionScheduler:
+    # Hướng mới chỉ có tác dụng khi thực thể tới tâm ô (giữa ô chỉ đi thẳng
+    # hoặc quay đầu), nên chỉ ra quyết định lại ở tâm một ô mới hoặc khi
+    # sự kiện liên quan thay đổi; giữa hai lần thì dùng lại quyết định cũ
+    def __init__(self):
+        self.tile = None
+        self.events = None
+        self.decision = None
+        self.decided = False
+        self.decisions = 0
+        self.reused = 0
+
+    def due(self, pixel_pos, tile, events):
+        if (
+            not self.decided
+            or events != self.events
+            or (at_tile_center(pixel_pos) and tile != self.tile)
+        ):
+            return True
+        self.reused += 1
+        return False
+
+    def commit(self, pixel_pos, tile, events, decision):
+        # Quyết định giữa ô không tính là đã xét tâm ô đó
+        self.tile = tile if at_tile_center(pixel_pos) else None
+        self.events = events
+        self.decision = decision
+        self.decided = True
+        self.decisions += 1
+        return decision
+
+    def reset(self):
+        self.decided = False
+
+    def stats(self):
+        total = self.decisions + self.reused
+        return {
+            "decisions": self.decisions,
+            "reused": self.reused,
+            "decision_rate": self.decisions / total if total else 0.0,
+        }
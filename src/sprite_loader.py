@@ -0,0 +1,78 @@
+import os
+import pygame
+
+TILE_SIZE = 20
+SPRITE_ROOT = "../assets/sprites"
+# Thư mục sprite dùng trong game và kích thước khi vẽ (None: giữ nguyên)
+PRELOAD_FOLDERS = {
+    "pacman": (TILE_SIZE, TILE_SIZE),
+    "ghosts": (TILE_SIZE, TILE_SIZE),
+    "frightened": (TILE_SIZE, TILE_SIZE),
+    "heal": (TILE_SIZE, TILE_SIZE),
+    "eyes": (TILE_SIZE, TILE_SIZE),
+}
+# Alpha được làm tròn theo bước này để số biến thể có hạn
+ALPHA_STEP = 32
+
+_sprites = {}
+_variants = {}
+
+
+def load_sprite(path, size=None):
+    # Cache toàn tiến trình theo (đường dẫn, kích thước): mọi Pacman / Ghost
+    # dùng chung một Surface, chỉ đọc đĩa và scale ở lần đầu. Surface dùng
+    # chung nên không được sửa trực tiếp (set_alpha...), hãy copy trước
+    key = (os.path.normpath(path), size)
+    sprite = _sprites.get(key)
+    if sprite is None:
+        sprite = pygame.image.load(path).convert_alpha()
+        if size is not None:
+            sprite = pygame.transform.scale(sprite, size)
+        _sprites[key] = sprite
+    return sprite
+
+
+def sprite_variant(sprite, angle=0, alpha=255):
+    # Bản đã xoay / chỉnh alpha của một sprite, tạo một lần rồi tra cứu nên
+    # hàm draw chỉ còn blit
+    alpha = min(255, ALPHA_STEP * round(alpha / ALPHA_STEP))
+    key = (sprite, angle % 360, alpha)
+    variant = _variants.get(key)
+    if variant is None:
+        variant = sprite
+        if angle % 360:
+            variant = pygame.transform.rotate(variant, angle)
+        if alpha < 255:
+            variant = variant.copy()
+            variant.set_alpha(alpha)
+        _variants[key] = variant
+    return variant
+
+
+def precompute_variants(sprites, angles=(0,), alphas=(255,)):
+    for sprite in sprites:
+        for angle in angles:
+            for alpha in alphas:
+                sprite_variant(sprite, angle, alpha)
+
+
+def preload_sprites(root=SPRITE_ROOT):
+    # Gọi sau set_mode (convert_alpha cần display) để lần tạo Pacman / Ghost
+    # đầu tiên không phải đọc đĩa
+    count = 0
+    for folder, size in PRELOAD_FOLDERS.items():
+        path = os.path.join(root, folder)
+        try:
+            names = sorted(os.listdir(path))
+        except OSError as e:
+            print(f"Cannot preload sprites from {path}: {e}")
+            continue
+        for name in names:
+            if name.endswith(".png"):
+                load_sprite(os.path.join(path, name), size)
+                count += 1
+    return count
+
+
+def cache_size():
+    return len(_sprites) + len(_variants)
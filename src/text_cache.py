@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+MAX_ENTRIES = 64
+
+
+class TextCache:
+    # Cache LRU có giới hạn cho Surface chữ của HUD: font.render chỉ chạy khi
+    # nội dung chữ đổi (điểm, thời gian), nhãn cố định như tên map và thuật
+    # toán render một lần. Surface dùng chung nên không được sửa trực tiếp
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, font, text, antialias, color):
+        key = (font, text, antialias, color)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.entries[key] = font.render(text, antialias, color)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+text_cache = TextCache()